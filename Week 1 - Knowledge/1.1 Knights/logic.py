@@ -1,4 +1,6 @@
 import itertools
+import re
+import struct
 
 
 class Sentence():
@@ -217,8 +219,8 @@ class Biconditional(Sentence):
                     and not self.right.evaluate(model)))
 
     def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
+        left = Sentence.parenthesize(self.left.formula())
+        right = Sentence.parenthesize(self.right.formula())
         return f"{left} <=> {right}"
 
     def symbols(self):
@@ -261,3 +263,257 @@ def model_check(knowledge, query):
 
     # Check that knowledge entails query
     return check_all(knowledge, query, symbols, dict())
+
+
+# Tokens of the formula syntax emitted by `Sentence.formula()`:
+# operators, parentheses, and symbol names (which may contain spaces)
+_TOKEN = re.compile(r"\s*(?:(<=>|=>|[¬∧∨()])|([^¬∧∨()<=]+)|(\S))")
+
+
+class _Parser():
+    """
+    Recursive descent parser for formula strings.
+    Precedence, from tightest to loosest binding: ¬, ∧, ∨, =>, <=>.
+    """
+
+    def __init__(self, formula):
+        self.tokens = []
+        for match in _TOKEN.finditer(formula.rstrip()):
+            operator, name, error = match.groups()
+            if error is not None:
+                raise ValueError(
+                    f"unexpected character {error!r} at position {match.start(3)}"
+                )
+            self.tokens.append(operator or name.rstrip())
+        # Sentinel marking the end of the formula
+        self.tokens.append(None)
+        self.position = 0
+        self.symbols = dict()
+
+    def peek(self):
+        return self.tokens[self.position]
+
+    def next(self):
+        token = self.tokens[self.position]
+        if token is None:
+            raise ValueError("unexpected end of formula")
+        self.position += 1
+        return token
+
+    def parse(self):
+        sentence = self.biconditional()
+        if self.peek() is not None:
+            raise ValueError(f"unexpected token {self.peek()!r}")
+        return sentence
+
+    def biconditional(self):
+        left = self.implication()
+        while self.peek() == "<=>":
+            self.next()
+            left = Biconditional(left, self.implication())
+        return left
+
+    def implication(self):
+        antecedent = self.disjunction()
+        if self.peek() == "=>":
+            self.next()
+            return Implication(antecedent, self.implication())
+        return antecedent
+
+    def disjunction(self):
+        disjuncts = [self.conjunction()]
+        while self.peek() == "∨":
+            self.next()
+            disjuncts.append(self.conjunction())
+        return disjuncts[0] if len(disjuncts) == 1 else Or(*disjuncts)
+
+    def conjunction(self):
+        conjuncts = [self.unary()]
+        while self.peek() == "∧":
+            self.next()
+            conjuncts.append(self.unary())
+        return conjuncts[0] if len(conjuncts) == 1 else And(*conjuncts)
+
+    def unary(self):
+        token = self.next()
+        if token == "¬":
+            return Not(self.unary())
+        if token == "(":
+            sentence = self.biconditional()
+            if self.next() != ")":
+                raise ValueError("expected ')'")
+            return sentence
+        if token in ("<=>", "=>", "∧", "∨", ")"):
+            raise ValueError(f"unexpected token {token!r}")
+        # Share a single Symbol object between all occurrences of a name
+        if token not in self.symbols:
+            self.symbols[token] = Symbol(token)
+        return self.symbols[token]
+
+
+def parse(formula):
+    """
+    Parses a formula string, in the syntax produced by `Sentence.formula()`,
+    into a logical sentence.
+    """
+    return _Parser(formula).parse()
+
+
+# Binary serialisation.
+# A file is the magic header followed by a stream of records. Each record
+# either defines a node (opcode, then operands as indices of earlier nodes)
+# or emits an already defined node as a top-level sentence. Identical
+# subtrees are written, and therefore constructed on load, only once.
+_MAGIC = b"KB\x01"
+_SYMBOL, _NOT, _AND, _OR, _IMPLICATION, _BICONDITIONAL, _EMIT = range(7)
+_HEADER = struct.Struct("<BI")
+_OPCODES = {
+    Not: _NOT,
+    And: _AND,
+    Or: _OR,
+    Implication: _IMPLICATION,
+    Biconditional: _BICONDITIONAL,
+}
+
+
+def _children(sentence):
+    """Returns the direct subsentences of a sentence."""
+    if isinstance(sentence, Not):
+        return [sentence.operand]
+    if isinstance(sentence, And):
+        return sentence.conjuncts
+    if isinstance(sentence, Or):
+        return sentence.disjuncts
+    if isinstance(sentence, Implication):
+        return [sentence.antecedent, sentence.consequent]
+    if isinstance(sentence, Biconditional):
+        return [sentence.left, sentence.right]
+    return []
+
+
+def dump(sentences, f):
+    """
+    Writes an iterable of logical sentences to binary file object `f`.
+    """
+    f.write(_MAGIC)
+    nodes = dict()      # structural key -> node index
+    for sentence in sentences:
+
+        # Node indices by object id, only for the nodes of this sentence:
+        # they stay alive while it is written, so their ids are not reused
+        indices = dict()
+
+        # Post-order traversal with an explicit stack, so that deep
+        # sentences do not hit the recursion limit
+        stack = [(sentence, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if id(node) in indices:
+                continue
+            children = _children(node)
+            if not expanded and children:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(children))
+                continue
+
+            if isinstance(node, Symbol):
+                key = (_SYMBOL, node.name)
+            elif type(node) in _OPCODES:
+                key = (_OPCODES[type(node)],
+                       tuple(indices[id(child)] for child in children))
+            else:
+                raise TypeError(f"cannot serialise {node!r}")
+
+            if key not in nodes:
+                opcode, operands = key
+                if opcode == _SYMBOL:
+                    name = operands.encode("utf-8")
+                    f.write(_HEADER.pack(opcode, len(name)))
+                    f.write(name)
+                else:
+                    f.write(_HEADER.pack(opcode, len(operands)))
+                    f.write(struct.pack(f"<{len(operands)}I", *operands))
+                nodes[key] = len(nodes)
+            indices[id(node)] = nodes[key]
+
+        f.write(_HEADER.pack(_EMIT, indices[id(sentence)]))
+
+
+def _read(f, size):
+    """Reads exactly `size` bytes from `f`."""
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("truncated knowledge base")
+    return data
+
+
+def iter_load(f):
+    """
+    Yields the logical sentences stored in binary file object `f`,
+    one at a time, as they are read.
+
+    Identical subsentences are loaded as a single shared object, so
+    subsentences must not be modified. Each yielded sentence is an
+    object of its own, to which conjuncts or disjuncts may be added.
+    """
+    if f.read(len(_MAGIC)) != _MAGIC:
+        raise ValueError("not a serialised knowledge base")
+    constructors = {
+        _NOT: Not,
+        _AND: And,
+        _OR: Or,
+        _IMPLICATION: Implication,
+        _BICONDITIONAL: Biconditional,
+    }
+    nodes = []
+    while True:
+        header = f.read(_HEADER.size)
+        if not header:
+            return
+        opcode, size = _HEADER.unpack(header + _read(f, _HEADER.size - len(header)))
+        if opcode == _EMIT:
+            operands = [size]
+        elif opcode == _SYMBOL:
+            nodes.append(Symbol(_read(f, size).decode("utf-8")))
+            continue
+        elif opcode in constructors:
+            operands = struct.unpack(f"<{size}I", _read(f, 4 * size))
+        else:
+            raise ValueError(f"unknown opcode {opcode}")
+        if any(i >= len(nodes) for i in operands):
+            raise ValueError("reference to an undefined node")
+        if opcode == _EMIT:
+            node = nodes[size]
+            if isinstance(node, (And, Or)):
+                node = type(node)(*_children(node))
+            yield node
+        else:
+            nodes.append(constructors[opcode](*[nodes[i] for i in operands]))
+
+
+def load(f):
+    """
+    Reads binary file object `f` and returns a conjunction of
+    all the logical sentences stored in it.
+    """
+    return And(*iter_load(f))
+
+
+def load_knowledge(filename):
+    """
+    Loads a knowledge base from a file and returns it as a conjunction.
+    The file is either written by `dump`, or a text file containing
+    one formula per line (blank lines and lines starting with # are ignored).
+    """
+    with open(filename, "rb") as f:
+        if f.read(len(_MAGIC)) == _MAGIC:
+            f.seek(0)
+            return load(f)
+
+    knowledge = And()
+    with open(filename, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                knowledge.add(parse(line))
+    return knowledge
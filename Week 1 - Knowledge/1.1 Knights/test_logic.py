@@ -0,0 +1,165 @@
+import io
+import tempfile
+import unittest
+
+from logic import *
+
+
+class ParseTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.A = Symbol("A")
+        self.B = Symbol("B")
+        self.C = Symbol("C")
+
+    def test_parse_symbol(self):
+        self.assertEqual(parse("A"), self.A)
+        self.assertEqual(parse("A is a Knight"), Symbol("A is a Knight"))
+
+    def test_parse_precedence(self):
+        A, B, C = self.A, self.B, self.C
+        self.assertEqual(parse("¬A ∧ B"), And(Not(A), B))
+        self.assertEqual(parse("A ∧ B ∨ C"), Or(And(A, B), C))
+        self.assertEqual(parse("A ∨ B => C"), Implication(Or(A, B), C))
+        self.assertEqual(parse("A => B <=> C"), Biconditional(Implication(A, B), C))
+        self.assertEqual(parse("A => B => C"), Implication(A, Implication(B, C)))
+        self.assertEqual(parse("A ∧ (B ∨ C)"), And(A, Or(B, C)))
+
+    def test_parse_round_trips_formula(self):
+        A, B, C = self.A, self.B, self.C
+        sentences = [
+            Not(A),
+            And(A, Not(B), C),
+            Or(A, And(B, C)),
+            Implication(And(A, B), Or(B, Not(C))),
+            Biconditional(Not(A), Or(B, C)),
+            Not(Biconditional(A, Implication(B, C))),
+        ]
+        for sentence in sentences:
+            with self.subTest(sentence=sentence):
+                self.assertEqual(parse(sentence.formula()), sentence)
+
+    def test_biconditional_formula(self):
+        sentence = Biconditional(Not(self.A), self.B)
+        self.assertEqual(sentence.formula(), "(¬A) <=> B")
+
+    def test_parse_raises_value_error_if_malformed(self):
+        for formula in ["", "A ∧", "(A ∨ B", "A B)", "∧ A", "A = B", "A <= B"]:
+            with self.subTest(formula=formula):
+                with self.assertRaises(ValueError):
+                    parse(formula)
+
+# End class
+
+
+class SerialisationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        A, B, C = Symbol("A"), Symbol("B"), Symbol("C")
+        shared = And(A, Not(B))
+        self.sentences = [
+            A,
+            Or(shared, C),
+            Implication(shared, Biconditional(B, Not(C))),
+        ]
+
+    def dumped(self):
+        f = io.BytesIO()
+        dump(self.sentences, f)
+        return f.getvalue()
+
+    def test_dump_and_iter_load(self):
+        sentences = list(iter_load(io.BytesIO(self.dumped())))
+        self.assertListEqual(sentences, self.sentences)
+
+    def test_dump_and_load(self):
+        self.assertEqual(load(io.BytesIO(self.dumped())), And(*self.sentences))
+
+    def test_dump_and_load_generator(self):
+        # Temporary sentences are freed while dumping, and their ids reused
+        f = io.BytesIO()
+        dump((Or(Symbol(f"A{i}"), Not(Symbol(f"B{i}"))) for i in range(200)), f)
+        f.seek(0)
+        for i, sentence in enumerate(iter_load(f)):
+            with self.subTest(i=i):
+                self.assertEqual(sentence, Or(Symbol(f"A{i}"), Not(Symbol(f"B{i}"))))
+        self.assertEqual(i, 199)
+
+    def test_loaded_sentences_are_separate_objects(self):
+        A, B, C = Symbol("A"), Symbol("B"), Symbol("C")
+        f = io.BytesIO()
+        dump([And(A, B), And(A, B), Implication(And(A, B), C)], f)
+        first, second, third = iter_load(io.BytesIO(f.getvalue()))
+        first.add(C)
+        self.assertEqual(first, And(A, B, C))
+        self.assertEqual(second, And(A, B))
+        self.assertEqual(third, Implication(And(A, B), C))
+
+    def test_dump_writes_shared_subtrees_once(self):
+        f = io.BytesIO()
+        dump(self.sentences[1:2], f)
+        size = len(f.getvalue())
+        f = io.BytesIO()
+        dump(self.sentences[1:2] * 2, f)
+        self.assertEqual(len(f.getvalue()), size + 5)
+
+    def test_load_knowledge(self):
+        with tempfile.TemporaryDirectory() as directory:
+            binary = f"{directory}/knowledge.kb"
+            with open(binary, "wb") as f:
+                dump(self.sentences, f)
+            text = f"{directory}/knowledge.txt"
+            with open(text, "w", encoding="utf-8") as f:
+                f.write("# knowledge\n\n")
+                f.write("\n".join(sentence.formula() for sentence in self.sentences))
+
+            self.assertEqual(load_knowledge(binary), And(*self.sentences))
+            self.assertEqual(load_knowledge(text), And(*self.sentences))
+
+    def test_iter_load_raises_value_error_if_not_serialised(self):
+        with self.assertRaises(ValueError):
+            list(iter_load(io.BytesIO(b"A => B")))
+
+    def test_iter_load_raises_value_error_if_truncated(self):
+        data = self.dumped()
+        # inside a header, and inside the name of a symbol
+        for size in [len(data) - 2, 3 + 5 + 1 + 2, 3 + 5]:
+            with self.subTest(size=size):
+                with self.assertRaises(ValueError):
+                    list(iter_load(io.BytesIO(data[:size])))
+
+    def test_iter_load_raises_value_error_if_undefined_node(self):
+        f = io.BytesIO()
+        dump([Not(Symbol("A"))], f)
+        data = f.getvalue().replace(b"\x01\x01\x00\x00\x00\x00\x00\x00\x00", b"\x01\x01\x00\x00\x00\x07\x00\x00\x00")
+        with self.assertRaises(ValueError):
+            list(iter_load(io.BytesIO(data)))
+
+# End class
+
+
+
+def suite():
+    suite = unittest.TestSuite()
+
+    suite.addTest(ParseTestCase('test_parse_symbol'))
+    suite.addTest(ParseTestCase('test_parse_precedence'))
+    suite.addTest(ParseTestCase('test_parse_round_trips_formula'))
+    suite.addTest(ParseTestCase('test_biconditional_formula'))
+    suite.addTest(ParseTestCase('test_parse_raises_value_error_if_malformed'))
+
+    suite.addTest(SerialisationTestCase('test_dump_and_iter_load'))
+    suite.addTest(SerialisationTestCase('test_dump_and_load'))
+    suite.addTest(SerialisationTestCase('test_dump_and_load_generator'))
+    suite.addTest(SerialisationTestCase('test_loaded_sentences_are_separate_objects'))
+    suite.addTest(SerialisationTestCase('test_dump_writes_shared_subtrees_once'))
+    suite.addTest(SerialisationTestCase('test_load_knowledge'))
+    suite.addTest(SerialisationTestCase('test_iter_load_raises_value_error_if_not_serialised'))
+    suite.addTest(SerialisationTestCase('test_iter_load_raises_value_error_if_truncated'))
+    suite.addTest(SerialisationTestCase('test_iter_load_raises_value_error_if_undefined_node'))
+
+    return suite
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite())
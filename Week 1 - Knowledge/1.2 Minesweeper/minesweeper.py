@@ -1,6 +1,56 @@
+import functools
 import itertools
+import math
 import random
 
+# Maximum number of search steps spent counting the mine configurations
+# of one frontier component before falling back to an approximation
+ENUMERATION_LIMIT = 100000
+
+
+def cells_to_mask(cells, width):
+    """
+    Returns the integer bitmask of a set of cells, where cell (i, j)
+    is bit i * width + j.
+    """
+    mask = 0
+    for i, j in cells:
+        mask |= 1 << (i * width + j)
+    return mask
+
+
+def iter_cells(mask, width):
+    """
+    Yields the cells of an integer bitmask, lowest bit first.
+    """
+    while mask:
+        low = mask & -mask
+        yield divmod(low.bit_length() - 1, width)
+        mask ^= low
+
+
+def mask_to_cells(mask, width):
+    """
+    Returns the set of cells of an integer bitmask.
+    """
+    return set(iter_cells(mask, width))
+
+
+def neighbors_mask(cell, height, width):
+    """
+    Returns the bitmask of the cells within one row and column
+    of `cell`, not including the cell itself.
+    """
+    i, j = cell
+    left = max(j - 1, 0)
+    window = (1 << (min(j + 1, width - 1) - left + 1)) - 1
+
+    # Up to three cells in each of up to three rows
+    mask = 0
+    for row in range(max(i - 1, 0), min(i + 2, height)):
+        mask |= window << (row * width + left)
+    return mask & ~(1 << (i * width + j))
+
 
 class Minesweeper():
     """
@@ -84,6 +134,76 @@ class Minesweeper():
         return self.mines_found == self.mines
 
 
+class BitMinesweeper(Minesweeper):
+    """
+    Minesweeper game representation storing the mines as an integer bitmask,
+    where cell (i, j) is bit i * width + j. Given the same random state,
+    the mines are placed exactly as in `Minesweeper`.
+    """
+
+    def __init__(self, height=8, width=8, mines=8):
+
+        # Set initial width, height, and number of mines
+        self.height = height
+        self.width = width
+        self.mine_mask = 0
+
+        # Add mines randomly
+        placed = 0
+        while placed != mines:
+            i = random.randrange(height)
+            j = random.randrange(width)
+            bit = 1 << (i * width + j)
+            if not self.mine_mask & bit:
+                self.mine_mask |= bit
+                placed += 1
+
+        # At first, player has found no mines
+        self.mines_found = set()
+
+        # Board as lists of booleans, only built if asked for
+        self._board = None
+
+    @property
+    def mines(self):
+        """
+        Set of the cells containing a mine.
+        """
+        return mask_to_cells(self.mine_mask, self.width)
+
+    @property
+    def board(self):
+        """
+        Board as a list of rows of booleans, True where there is a mine.
+        Built on first access; the mines do not move afterwards.
+        """
+        if self._board is None:
+            self._board = [
+                [self.is_mine((i, j)) for j in range(self.width)]
+                for i in range(self.height)
+            ]
+        return self._board
+
+    def is_mine(self, cell):
+        i, j = cell
+        return bool(self.mine_mask >> (i * self.width + j) & 1)
+
+    def nearby_mines(self, cell):
+        """
+        Returns the number of mines that are
+        within one row and column of a given cell,
+        not including the cell itself.
+        """
+        neighbors = neighbors_mask(cell, self.height, self.width)
+        return (self.mine_mask & neighbors).bit_count()
+
+    def won(self):
+        """
+        Checks if all mines have been flagged.
+        """
+        return cells_to_mask(self.mines_found, self.width) == self.mine_mask
+
+
 class Sentence():
     """
     Logical statement about a Minesweeper game
@@ -98,6 +218,14 @@ class Sentence():
     def __eq__(self, other):
         return self.cells == other.cells and self.count == other.count
 
+    def __hash__(self):
+        # Sentences are hashed by value: a sentence must not be modified
+        # while it is stored in a set or used as a dictionary key
+        return hash((frozenset(self.cells), self.count))
+
+    def __len__(self):
+        return len(self.cells)
+
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
@@ -139,18 +267,126 @@ class Sentence():
             # remove cell from sentence, count remains unaltered
             self.cells.remove(cell)
 
+    def is_subset(self, other):
+        """
+        Returns True if self.cells is a proper subset of other.cells.
+        """
+        return self.cells < other.cells
+
+    def subtract(self, other):
+        """
+        Returns the sentence inferred by removing the cells of `other`,
+        whose cells are a subset of self.cells, from this sentence.
+        """
+        return Sentence(self.cells - other.cells, self.count - other.count)
+
+
+class BitSentence(Sentence):
+    """
+    Sentence storing its cells as an integer bitmask, where cell (i, j)
+    is bit i * width + j. Subset tests and differences are single
+    integer operations.
+    """
+
+    def __init__(self, cells, count, width):
+        self.width = width
+        self.mask = cells_to_mask(cells, width)
+        self.count = count
+
+    @classmethod
+    def from_mask(cls, mask, count, width):
+        sentence = cls((), count, width)
+        sentence.mask = mask
+        return sentence
+
+    @property
+    def cells(self):
+        """
+        Set of the cells in the sentence (a new set on every access).
+        """
+        return mask_to_cells(self.mask, self.width)
+
+    def __eq__(self, other):
+        # Only equal to other BitSentences, compared without decoding the
+        # masks: the two sentence types are not mixed in one knowledge base
+        if not isinstance(other, BitSentence):
+            return False
+        return (
+            self.mask == other.mask and self.count == other.count
+            and self.width == other.width
+        )
+
+    def __hash__(self):
+        return hash((self.mask, self.count))
+
+    def __len__(self):
+        return self.mask.bit_count()
+
+    def known_mines(self):
+        """
+        Returns the set of all cells in self.cells known to be mines.
+        """
+        if self.mask.bit_count() == self.count:
+            return self.cells
+        else:
+            return set()
+
+    def known_safes(self):
+        """
+        Returns the set of all cells in self.cells known to be safe.
+        """
+        if self.count == 0:
+            return self.cells
+        else:
+            return set()
+
+    def mark_mine(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be a mine.
+        """
+        bit = 1 << (cell[0] * self.width + cell[1])
+        if self.mask & bit:
+            self.mask ^= bit
+            self.count -= 1
+
+    def mark_safe(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be safe.
+        """
+        self.mask &= ~(1 << (cell[0] * self.width + cell[1]))
+
+    def is_subset(self, other):
+        """
+        Returns True if the cells of self are a proper subset of other's.
+        """
+        return self.mask != other.mask and self.mask & ~other.mask == 0
+
+    def subtract(self, other):
+        """
+        Returns the sentence inferred by removing the cells of `other`,
+        whose cells are a subset of self.cells, from this sentence.
+        """
+        return BitSentence.from_mask(
+            self.mask & ~other.mask, self.count - other.count, self.width
+        )
+
 
 class MinesweeperAI():
     """
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=None):
 
         # Set initial height and width
         self.height = height
         self.width = width
 
+        # Total number of mines on the board, if known
+        self.total_mines = mines
+
         # Keep track of which cells have been clicked on
         self.moves_made = set()
 
@@ -158,8 +394,66 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
-        # List of sentences about the game known to be true
-        self.knowledge = []
+        # Set of sentences about the game known to be true
+        self.knowledge = set()
+
+    @property
+    def knowledge(self):
+        """
+        Set of sentences about the game known to be true.
+        Sentences must not be modified in place; use `mark_mine` and
+        `mark_safe`, which keep the knowledge base and its index up to date.
+        """
+        return self._knowledge
+
+    @knowledge.setter
+    def knowledge(self, sentences):
+        # Sentences containing a given cell
+        self.cell_index = dict()
+        # Sentences added or modified since they were last used for inference
+        self.changed = set()
+        self._knowledge = set()
+        for sentence in sentences:
+            self.add_sentence(sentence)
+
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base and indexes it by its cells.
+        Does nothing if an equal sentence is already known.
+        """
+        if sentence in self._knowledge:
+            return
+        self._knowledge.add(sentence)
+        self.changed.add(sentence)
+        for cell in self.cells_of(sentence):
+            self.cell_index.setdefault(cell, set()).add(sentence)
+
+    def remove_sentence(self, sentence):
+        """
+        Removes a sentence from the knowledge base and from the index.
+        """
+        self._knowledge.discard(sentence)
+        self.changed.discard(sentence)
+        for cell in self.cells_of(sentence):
+            sentences = self.cell_index.get(cell)
+            if sentences is not None:
+                sentences.discard(sentence)
+                if not sentences:
+                    del self.cell_index[cell]
+
+    def update_sentences(self, cell, is_mine):
+        """
+        Marks `cell` as a mine (if `is_mine`) or as safe in every sentence
+        containing it. Only those sentences are touched; they are
+        re-inserted so that hashing and the index stay valid.
+        """
+        for sentence in self.cell_index.pop(cell, set()):
+            self.remove_sentence(sentence)
+            if is_mine:
+                sentence.mark_mine(cell)
+            else:
+                sentence.mark_safe(cell)
+            self.add_sentence(sentence)
 
     def mark_mine(self, cell):
         """
@@ -167,8 +461,7 @@ class MinesweeperAI():
         to mark that cell as a mine as well.
         """
         self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self.update_sentences(cell, True)
 
     def mark_safe(self, cell):
         """
@@ -176,8 +469,19 @@ class MinesweeperAI():
         to mark that cell as safe as well.
         """
         self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        self.update_sentences(cell, False)
+
+    def new_sentence(self, cells, count):
+        """
+        Returns a new sentence about `cells`, of the type this AI uses.
+        """
+        return Sentence(cells, count)
+
+    def cells_of(self, sentence):
+        """
+        Returns an iterable over the cells of a sentence of this AI.
+        """
+        return sentence.cells
 
     def add_current_move_to_knowledge_base(self, cell, count):
         """
@@ -203,59 +507,73 @@ class MinesweeperAI():
                         pass
                     else:
                         cells.add((i, j))
-        s = Sentence(cells, c)
-        self.knowledge.append(s)
+        s = self.new_sentence(cells, c)
+        self.add_sentence(s)
 
     def update_safes(self):
         """
-        If, based on any of the sentences in self.knowledge, new cells can be marked as safe then the function does so.
+        If, based on any of the sentences changed since the last inference, new cells can be marked as safe then the function does so.
         Returns True if change has been made, otherwise False.
         """
-        change = False
-        safe_cells = self.safes
-        for sentence in self.knowledge:
-            safe_cells = safe_cells.union(sentence.known_safes())         
+        safe_cells = set()
+        for sentence in self.changed:
+            safe_cells.update(sentence.known_safes())
+        safe_cells.difference_update(self.safes)
         for cell in safe_cells:
-            if not cell in self.safes:
-                self.mark_safe(cell)
-                change = True
-        return change
+            self.mark_safe(cell)
+        return len(safe_cells) > 0
 
     def update_mines(self):
         """
-        If, based on any of the sentences in self.knowledge, new cells can be marked as mine then the function does so.
+        If, based on any of the sentences changed since the last inference, new cells can be marked as mine then the function does so.
         Returns True if change has been made, otherwise False.
         """
-        change = False
-        mine_cells = self.mines
-        for sentence in self.knowledge:
-            mine_cells = mine_cells.union(sentence.known_mines())        
+        mine_cells = set()
+        for sentence in self.changed:
+            mine_cells.update(sentence.known_mines())
+        mine_cells.difference_update(self.mines)
         for cell in mine_cells:
-            if not cell in self.mines:
-                self.mark_mine(cell)
-                change = True
-        return change
+            self.mark_mine(cell)
+        return len(mine_cells) > 0
 
     def cleanup_knowledge(self):
         """
         Removes empty sentences from knowledge base.
+        Sentences only become empty when they change, so only changed sentences are checked.
         """
-        self.knowledge = [sentence for sentence in self.knowledge if sentence.cells != set()]
+        empty_sentences = [sentence for sentence in self.changed if len(sentence) == 0]
+        for sentence in empty_sentences:
+            self.remove_sentence(sentence)
 
     def infer_new_sentences(self):
         """
         Adds any new sentences to the AI's knowledge base
         if they can be inferred from existing knowledge.
+
+        Only sentences changed since the last inference are compared, and only
+        against sentences sharing at least one cell with them (a subset of a
+        non-empty sentence must share its cells).
         """
         change = False
-        for sentence1, sentence2 in itertools.combinations(self.knowledge, 2):
-            set1, set2 = sentence1.cells, sentence2.cells
-            count1, count2 = sentence1.count, sentence2.count
-            # if set 1 is subset of set 2 and set 1 != set 2
-            if set1 < set2: 
-                s = Sentence(set2 - set1, count2- count1)
-                if not s in self.knowledge:
-                    self.knowledge.append(s)
+        changed, self.changed = self.changed, set()
+        for sentence1 in changed:
+            if sentence1 not in self._knowledge:
+                continue
+            # sentences sharing at least one cell with sentence1
+            neighbors = set()
+            for cell in self.cells_of(sentence1):
+                neighbors.update(self.cell_index[cell])
+            neighbors.discard(sentence1)
+            for sentence2 in neighbors:
+                if sentence1.is_subset(sentence2):
+                    subset, superset = sentence1, sentence2
+                elif sentence2.is_subset(sentence1):
+                    subset, superset = sentence2, sentence1
+                else:
+                    continue
+                s = superset.subtract(subset)
+                if s not in self._knowledge:
+                    self.add_sentence(s)
                     change = True
         return change
 
@@ -273,6 +591,8 @@ class MinesweeperAI():
                if it can be concluded based on the AI's knowledge base
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
+
+        Only sentences touching cells changed by this move are re-examined.
         """
 
         # mark the cell as one of the moves made in the game 
@@ -307,20 +627,319 @@ class MinesweeperAI():
         """
         available_safe_moves = self.safes.difference(self.moves_made)
         if len(available_safe_moves) > 0:
-            return random.sample(available_safe_moves, 1)[0]
+            return random.choice(sorted(available_safe_moves))
         return None
 
+    def frontier_components(self):
+        """
+        Splits the knowledge base into independent components.
+        Returns a list of sets of sentences; sentences of different
+        components do not share any cell.
+        """
+        components = []
+        visited = set()
+        for sentence in self.knowledge:
+            if sentence in visited or len(sentence) == 0:
+                continue
+            component = set()
+            stack = [sentence]
+            visited.add(sentence)
+            while stack:
+                current = stack.pop()
+                component.add(current)
+                for cell in self.cells_of(current):
+                    for neighbor in self.cell_index[cell]:
+                        if neighbor not in visited:
+                            visited.add(neighbor)
+                            stack.append(neighbor)
+            components.append(component)
+        return components
+
+    def mine_probabilities(self):
+        """
+        Returns a dictionary mapping every undetermined cell (not yet chosen,
+        not known to be safe or a mine) to the probability that it is a mine.
+
+        Consistent mine configurations are counted per frontier component.
+        If the total number of mines is known, configurations are weighted
+        by the number of ways to place the remaining mines on the cells not
+        constrained by any sentence.
+        """
+        all_cells = set(itertools.product(range(self.height), range(self.width)))
+        unknown = all_cells.difference(self.moves_made, self.mines, self.safes)
+        interior = unknown.difference(self.cell_index)
+        remaining = (
+            None if self.total_mines is None
+            else self.total_mines - len(self.mines)
+        )
+
+        probabilities = dict()
+        exact = []  # (groups, configurations) of exactly counted components
+        for component in self.frontier_components():
+            constraints = frozenset(
+                (frozenset(sentence.cells), sentence.count)
+                for sentence in component
+            )
+            result = count_configurations(constraints)
+            if result is None:
+                # Component too large: estimate every cell from its sentences
+                estimated_mines = 0
+                for sentence in component:
+                    for cell in sentence.cells:
+                        p = sentence.count / len(sentence.cells)
+                        if p > probabilities.get(cell, 0):
+                            probabilities[cell] = p
+                for cell in set().union(*(s.cells for s in component)):
+                    estimated_mines += probabilities[cell]
+                if remaining is not None:
+                    remaining = max(0, remaining - round(estimated_mines))
+            else:
+                exact.append(result)
+
+        # Number of ways to place `k` mines on the frontier,
+        # over all exactly counted components
+        totals = {0: 1}
+        for _, configurations in exact:
+            totals = _convolve(totals, {k: c for k, (c, _) in configurations.items()})
+
+        def weight(k):
+            """Weight of configurations placing `k` mines on the frontier."""
+            if remaining is None:
+                return 1
+            if not 0 <= remaining - k <= len(interior):
+                return 0
+            return math.comb(len(interior), remaining - k)
+
+        norm = sum(count * weight(k) for k, count in totals.items())
+        if norm == 0:
+            # Inconsistent with the mine count: ignore it
+            remaining = None
+            norm = sum(totals.values())
+
+        for index, (groups, configurations) in enumerate(exact):
+            # Configurations of all other components
+            others = {0: 1}
+            for other, (_, other_configurations) in enumerate(exact):
+                if other != index:
+                    others = _convolve(
+                        others, {k: c for k, (c, _) in other_configurations.items()}
+                    )
+            for group_index, group in enumerate(groups):
+                mines = 0
+                for k, (_, group_mines) in configurations.items():
+                    mines += group_mines[group_index] * sum(
+                        count * weight(k + j) for j, count in others.items()
+                    )
+                for cell in group:
+                    probabilities[cell] = mines / norm / len(group)
+
+        if interior:
+            if remaining is not None:
+                expected = sum(
+                    count * weight(k) * (remaining - k)
+                    for k, count in totals.items()
+                ) / norm
+                p = expected / len(interior)
+            elif probabilities:
+                # Without a mine count, assume the frontier's mine density
+                p = sum(probabilities.values()) / len(probabilities)
+            else:
+                p = 0.5
+            for cell in interior:
+                probabilities[cell] = p
+
+        return probabilities
 
     def make_random_move(self):
         """
         Returns a move to make on the Minesweeper board.
-        Should choose randomly among cells that:
+        Chooses, among cells that:
             1) have not already been chosen, and
             2) are not known to be mines
+        one with the lowest probability of being a mine
+        (randomly, if there is a tie).
         """
-        # set of all cells in field
-        all_cells = set(itertools.product(range(self.height), range(self.width)))
-        available_random_moves = all_cells.difference(self.moves_made, self.mines)
-        if len(available_random_moves) > 0:
-            return random.sample(available_random_moves, 1)[0]
+        available_safe_moves = self.safes.difference(self.moves_made)
+        if available_safe_moves:
+            return random.choice(sorted(available_safe_moves))
+        probabilities = self.mine_probabilities()
+        if not probabilities:
+            return None
+        lowest = min(probabilities.values())
+        candidates = sorted(
+            cell for cell, p in probabilities.items()
+            if math.isclose(p, lowest, abs_tol=1e-9)
+        )
+        return random.choice(candidates)
+
+
+def _convolve(a, b):
+    """
+    Multiplies two polynomials given as dictionaries {exponent: coefficient}.
+    """
+    result = dict()
+    for i, x in a.items():
+        for j, y in b.items():
+            result[i + j] = result.get(i + j, 0) + x * y
+    return result
+
+
+@functools.lru_cache(maxsize=256)
+def count_configurations(constraints):
+    """
+    Counts the mine configurations consistent with `constraints`, a frozenset
+    of (cells, count) pairs forming one connected component.
+
+    Cells that appear in exactly the same constraints are interchangeable
+    and are enumerated together as a group. Returns a tuple (groups,
+    configurations), where groups is a list of sets of cells and
+    configurations maps a number of mines k to a tuple (count, group_mines):
+    the number of configurations with k mines, and for each group the total
+    number of mines it holds over those configurations.
+    Returns None if counting takes more than ENUMERATION_LIMIT steps.
+    """
+    constraints = list(constraints)
+    membership = dict()
+    for index, (cells, _) in enumerate(constraints):
+        for cell in cells:
+            membership.setdefault(cell, []).append(index)
+    grouped = dict()
+    for cell, indices in membership.items():
+        grouped.setdefault(tuple(indices), set()).add(cell)
+
+    # Order groups so that each one shares constraints with earlier ones,
+    # which lets constraints be checked (and pruned) as early as possible
+    groups = sorted(grouped.items(), key=lambda item: (item[0], sorted(item[1])))
+    ordered = [groups.pop(0)]
+    seen = set(ordered[0][0])
+    while groups:
+        index = next(
+            (i for i, (indices, _) in enumerate(groups) if seen.intersection(indices)),
+            0
+        )
+        ordered.append(groups.pop(index))
+        seen.update(ordered[-1][0])
+
+    sizes = [len(cells) for _, cells in ordered]
+    group_constraints = [indices for indices, _ in ordered]
+    mines_left = [count for _, count in constraints]
+    cells_left = [len(cells) for cells, _ in constraints]
+    configurations = dict()
+    assigned = [0] * len(ordered)
+    steps = 0
+
+    def search(position, multiplicity, mines):
+        nonlocal steps
+        steps += 1
+        if steps > ENUMERATION_LIMIT:
+            return False
+        if position == len(ordered):
+            count, group_mines = configurations.get(mines, (0, [0] * len(ordered)))
+            for i, m in enumerate(assigned):
+                group_mines[i] += multiplicity * m
+            configurations[mines] = (count + multiplicity, group_mines)
+            return True
+        size = sizes[position]
+        indices = group_constraints[position]
+        for m in range(size + 1):
+            if all(
+                0 <= mines_left[c] - m <= cells_left[c] - size
+                for c in indices
+            ):
+                for c in indices:
+                    mines_left[c] -= m
+                    cells_left[c] -= size
+                assigned[position] = m
+                completed = search(position + 1, multiplicity * math.comb(size, m), mines + m)
+                for c in indices:
+                    mines_left[c] += m
+                    cells_left[c] += size
+                if not completed:
+                    return False
+        return True
+
+    if not search(0, 1, 0) or not configurations:
         return None
+    return [cells for _, cells in ordered], configurations
+
+
+class BitMinesweeperAI(MinesweeperAI):
+    """
+    Minesweeper game player whose knowledge consists of `BitSentence`s.
+    Mines, safe cells and moves made are also tracked as bitmasks, which
+    are kept up to date by `mark_mine`, `mark_safe` and `add_knowledge`.
+    """
+
+    def __init__(self, height=8, width=8, mines=None):
+        super().__init__(height=height, width=width, mines=mines)
+        self.mines_mask = 0
+        self.safes_mask = 0
+        self.moves_made_mask = 0
+
+    def new_sentence(self, cells, count):
+        """
+        Returns a new sentence about `cells`, of the type this AI uses.
+        """
+        return BitSentence(cells, count, self.width)
+
+    def cells_of(self, sentence):
+        """
+        Returns an iterable over the cells of a sentence of this AI,
+        walking the set bits of its mask.
+        """
+        return iter_cells(sentence.mask, self.width)
+
+    def add_current_move_to_knowledge_base(self, cell, count):
+        """
+        Adds a new sentence to the AI's knowledge base, based on the value of cell and count.
+        """
+        neighbors = neighbors_mask(cell, self.height, self.width)
+        count -= (neighbors & self.mines_mask).bit_count()
+        mask = neighbors & ~(self.mines_mask | self.safes_mask)
+        self.add_sentence(BitSentence.from_mask(mask, count, self.width))
+
+    def mark_mine(self, cell):
+        """
+        Marks a cell as a mine, and updates all knowledge
+        to mark that cell as a mine as well.
+        """
+        self.mines_mask |= 1 << (cell[0] * self.width + cell[1])
+        super().mark_mine(cell)
+
+    def mark_safe(self, cell):
+        """
+        Marks a cell as safe, and updates all knowledge
+        to mark that cell as safe as well.
+        """
+        self.safes_mask |= 1 << (cell[0] * self.width + cell[1])
+        super().mark_safe(cell)
+
+    def add_knowledge(self, cell, count):
+        """
+        Called when the Minesweeper board tells us, for a given
+        safe cell, how many neighboring cells have mines in them.
+        """
+        self.moves_made_mask |= 1 << (cell[0] * self.width + cell[1])
+        super().add_knowledge(cell, count)
+
+    def make_safe_move(self):
+        """
+        Returns a safe cell to choose on the Minesweeper board.
+        The move must be known to be safe, and not already a move
+        that has been made.
+        """
+        available_safe_moves = self.safes_mask & ~self.moves_made_mask
+        if not available_safe_moves:
+            return None
+
+        # Same choice as random.choice(sorted(cells)), without decoding
+        # the mask: binary search for the bit with `n` set bits below it
+        n = random.randrange(available_safe_moves.bit_count())
+        low, high = 0, available_safe_moves.bit_length() - 1
+        while low < high:
+            middle = (low + high) // 2
+            if (available_safe_moves & ((2 << middle) - 1)).bit_count() > n:
+                high = middle
+            else:
+                low = middle + 1
+        return divmod(low, self.width)
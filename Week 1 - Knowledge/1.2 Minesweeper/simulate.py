@@ -0,0 +1,102 @@
+import functools
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from minesweeper import BitMinesweeper, BitMinesweeperAI, Minesweeper, MinesweeperAI
+
+HEIGHT = 8
+WIDTH = 8
+MINES = 8
+
+
+def main():
+
+    # Check for proper usage
+    args = sys.argv[1:]
+    bits = "--bits" in args
+    if bits:
+        args.remove("--bits")
+    if len(args) not in [1, 4]:
+        sys.exit("Usage: python simulate.py games [height width mines] [--bits]")
+    games = int(args[0])
+    if len(args) == 4:
+        height, width, mines = (int(arg) for arg in args[1:])
+    else:
+        height, width, mines = HEIGHT, WIDTH, MINES
+
+    start = time.perf_counter()
+    results = simulate(games, height, width, mines, bits=bits)
+    elapsed = time.perf_counter() - start
+
+    # Print results
+    wins = sum(won for won, _, _, _ in results)
+    moves = sum(moves for _, moves, _, _ in results)
+    knowledge_time = sum(t for _, _, t, _ in results)
+    knowledge_calls = sum(calls for _, _, _, calls in results)
+    print(f"Games: {games} ({height}x{width}, {mines} mines, seeds 0-{games - 1})")
+    print(f"Representation: {'bitmasks' if bits else 'sets'}")
+    print(f"Win rate: {wins / games:.4f}")
+    print(f"Mean moves: {moves / games:.2f}")
+    print(f"Time per add_knowledge: {1000 * knowledge_time / max(knowledge_calls, 1):.4f} ms")
+    print(f"Total time: {elapsed:.2f} s")
+
+
+def simulate(games, height, width, mines, processes=None, bits=False):
+    """
+    Play `games` games, seeded 0 to games - 1, across a process pool.
+    Return a list of `play` results, in seed order.
+    """
+    play_game = functools.partial(play, height, width, mines, bits=bits)
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        chunksize = max(1, games // (4 * (processes or os.cpu_count() or 1)))
+        return list(executor.map(play_game, range(games), chunksize=chunksize))
+
+
+def play(height, width, mines, seed, bits=False):
+    """
+    Play one game with the AI, without a graphical interface.
+    The board and every choice of the AI depend only on `seed`.
+    If `bits` is true, the game and the AI store cells as bitmasks.
+
+    Return a tuple (won, moves, knowledge_time, knowledge_calls): whether
+    the AI won, how many moves it made, and the total time spent in and
+    number of calls to `add_knowledge`.
+    """
+    random.seed(seed)
+    if bits:
+        game = BitMinesweeper(height=height, width=width, mines=mines)
+        ai = BitMinesweeperAI(height=height, width=width, mines=mines)
+    else:
+        game = Minesweeper(height=height, width=width, mines=mines)
+        ai = MinesweeperAI(height=height, width=width, mines=mines)
+
+    moves = 0
+    knowledge_time = 0
+    safe_cells = height * width - mines
+    while len(ai.moves_made) < safe_cells:
+        move = ai.make_safe_move()
+        if move is None:
+            move = ai.make_random_move()
+            if move is None:
+                break
+        moves += 1
+
+        # Lost if a mine was revealed
+        if game.is_mine(move):
+            return False, moves, knowledge_time, len(ai.moves_made)
+
+        nearby = game.nearby_mines(move)
+        start = time.perf_counter()
+        ai.add_knowledge(move, nearby)
+        knowledge_time += time.perf_counter() - start
+
+    # Won only if every safe cell was revealed before the AI ran out of moves
+    won = len(ai.moves_made) == safe_cells
+    return won, moves, knowledge_time, len(ai.moves_made)
+
+
+if __name__ == "__main__":
+    main()
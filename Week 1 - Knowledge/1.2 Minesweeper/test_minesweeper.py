@@ -1,7 +1,11 @@
+import random
 import unittest
 from copy import deepcopy
+from unittest.mock import patch
 
 from minesweeper import Sentence, MinesweeperAI
+from minesweeper import BitSentence, BitMinesweeper, BitMinesweeperAI, Minesweeper
+import simulate
 
 
 class SentenceTestCase(unittest.TestCase):
@@ -106,9 +110,10 @@ class MinesweeperAITestCase(unittest.TestCase):
         ai.add_current_move_to_knowledge_base(cell, count)
 
         self.assertEqual(len(ai.knowledge), 1)
-        self.assertIsInstance(ai.knowledge[0], Sentence)
-        self.assertEqual(ai.knowledge[0].cells, {(0, 0), (0, 1), (0, 2), (1, 0), (1, 2), (2, 0), (2, 1), (2, 2)})
-        self.assertEqual(ai.knowledge[0].count, count)
+        sentence = next(iter(ai.knowledge))
+        self.assertIsInstance(sentence, Sentence)
+        self.assertEqual(sentence.cells, {(0, 0), (0, 1), (0, 2), (1, 0), (1, 2), (2, 0), (2, 1), (2, 2)})
+        self.assertEqual(sentence.count, count)
 
     def test_add_current_move_to_nonempty_knowledge_base(self):
         ai = MinesweeperAI(3, 3)
@@ -120,8 +125,7 @@ class MinesweeperAITestCase(unittest.TestCase):
         self.assertEqual(len(ai.knowledge), 2)
         for sentence in ai.knowledge:
             self.assertIsInstance(sentence, Sentence)
-        self.assertEqual(ai.knowledge[1].cells, {(0, 1), (1, 0), (1, 1)})
-        self.assertEqual(ai.knowledge[1].count, count)
+        self.assertIn(Sentence({(0, 1), (1, 0), (1, 1)}, count), ai.knowledge)
 
     def test_update_safes(self):
         ai = MinesweeperAI(3, 3)
@@ -130,7 +134,7 @@ class MinesweeperAITestCase(unittest.TestCase):
 
         self.assertSetEqual(ai.safes, {(0, 1), (1, 0), (1, 1)})
         self.assertTrue(result)
-        self.assertSetEqual(ai.knowledge[0].cells, set())
+        self.assertSetEqual(next(iter(ai.knowledge)).cells, set())
 
     def test_update_safes_nochange(self):
         ai = MinesweeperAI(3, 3)
@@ -140,7 +144,7 @@ class MinesweeperAITestCase(unittest.TestCase):
 
         self.assertSetEqual(ai.safes, {(0, 1), (1, 0), (1, 1)})
         self.assertFalse(result)
-        self.assertSetEqual(ai.knowledge[0].cells, {(0, 1), (1, 0), (1, 1)})
+        self.assertSetEqual(next(iter(ai.knowledge)).cells, {(0, 1), (1, 0), (1, 1)})
 
     def test_update_mines(self):
         ai = MinesweeperAI(3, 3)
@@ -149,7 +153,7 @@ class MinesweeperAITestCase(unittest.TestCase):
 
         self.assertSetEqual(ai.mines, {(0, 1), (1, 0), (1, 1)})
         self.assertTrue(result)
-        self.assertSetEqual(ai.knowledge[0].cells, set())
+        self.assertSetEqual(next(iter(ai.knowledge)).cells, set())
 
     def test_update_mines_nochange(self):
         ai = MinesweeperAI(3, 3)
@@ -159,7 +163,7 @@ class MinesweeperAITestCase(unittest.TestCase):
 
         self.assertSetEqual(ai.mines, {(0, 1), (1, 0), (1, 1)})
         self.assertFalse(result)
-        self.assertSetEqual(ai.knowledge[0].cells, {(0, 1), (1, 0), (1, 1)})
+        self.assertSetEqual(next(iter(ai.knowledge)).cells, {(0, 1), (1, 0), (1, 1)})
 
     def test_cleanup_knowledge_single(self):
         ai = MinesweeperAI(3, 3)
@@ -178,7 +182,8 @@ class MinesweeperAITestCase(unittest.TestCase):
             Sentence({}, 0), 
             Sentence({}, 0)
         ]
-        self.assertEqual(len(ai.knowledge), 3)
+        # equal sentences are only stored once
+        self.assertEqual(len(ai.knowledge), 2)
         ai.cleanup_knowledge()  
         self.assertEqual(len(ai.knowledge), 1)
 
@@ -203,8 +208,7 @@ class MinesweeperAITestCase(unittest.TestCase):
 
         self.assertEqual(len(ai.knowledge), 3)
         self.assertTrue(result)
-        self.assertEqual(ai.knowledge[2].cells, expected.cells)
-        self.assertEqual(ai.knowledge[2].count, expected.count)
+        self.assertIn(expected, ai.knowledge)
 
     def test_infer_new_sentences_unsuccessful_1(self):
         ai = MinesweeperAI(3, 3)
@@ -214,7 +218,8 @@ class MinesweeperAITestCase(unittest.TestCase):
         ]
         result = ai.infer_new_sentences()
 
-        self.assertEqual(len(ai.knowledge), 2)
+        # equal sentences are only stored once
+        self.assertEqual(len(ai.knowledge), 1)
         self.assertFalse(result)
 
     def test_make_safe_move_returns_valid_cell_if_one_available(self):
@@ -269,6 +274,133 @@ class MinesweeperAITestCase(unittest.TestCase):
 
         self.assertIsNone(result)
 
+    def test_mine_probabilities_single_sentence(self):
+        ai = MinesweeperAI(3, 3)
+        ai.moves_made = {(0, 0), (0, 1), (1, 0), (1, 1)}
+        ai.safes = {(0, 0), (0, 1), (1, 0), (1, 1)}
+        ai.knowledge = [Sentence({(0, 2), (1, 2)}, 1)]
+        result = ai.mine_probabilities()
+
+        self.assertAlmostEqual(result[(0, 2)], 0.5)
+        self.assertAlmostEqual(result[(1, 2)], 0.5)
+        self.assertAlmostEqual(result[(2, 2)], 0.5)
+
+    def test_mine_probabilities_weighted_by_mine_count(self):
+        # exactly one mine in total, which must be in the sentence
+        ai = MinesweeperAI(3, 3, mines=1)
+        ai.moves_made = {(0, 0), (0, 1), (1, 0), (1, 1)}
+        ai.safes = {(0, 0), (0, 1), (1, 0), (1, 1)}
+        ai.knowledge = [Sentence({(0, 2), (1, 2)}, 1)]
+        result = ai.mine_probabilities()
+
+        self.assertAlmostEqual(result[(0, 2)], 0.5)
+        self.assertAlmostEqual(result[(2, 0)], 0)
+        self.assertAlmostEqual(sum(result.values()), 1)
+
+    def test_make_random_move_returns_lowest_risk_cell(self):
+        ai = MinesweeperAI(1, 5, mines=2)
+        ai.moves_made = {(0, 0)}
+        ai.safes = {(0, 0)}
+        ai.knowledge = [Sentence({(0, 1)}, 1), Sentence({(0, 2), (0, 3), (0, 4)}, 1)]
+        result = ai.make_random_move()
+
+        self.assertIn(result, [(0, 2), (0, 3), (0, 4)])
+
+
+# End class
+
+
+class BitRepresentationTestCase(unittest.TestCase):
+
+    def test_bit_sentence_cells(self):
+        cells = {(0, 1), (1, 0), (2, 2)}
+        s = BitSentence(cells, 2, 3)
+
+        self.assertEqual(s.mask, 0b100001010)
+        self.assertSetEqual(s.cells, cells)
+        self.assertEqual(len(s), 3)
+        self.assertEqual(s, BitSentence.from_mask(0b100001010, 2, 3))
+        self.assertEqual(len({s, BitSentence(cells, 2, 3)}), 1)
+        self.assertNotEqual(s, BitSentence(cells, 1, 3))
+        self.assertNotEqual(s, BitSentence.from_mask(s.mask, 2, 4))
+        self.assertNotEqual(s, Sentence(cells, 2))
+
+    def test_bit_sentence_mark_mine_and_safe(self):
+        s = BitSentence({(0, 1), (1, 0), (1, 1)}, 2, 3)
+        s.mark_mine((1, 1))
+        s.mark_safe((1, 0))
+        s.mark_safe((2, 2))
+
+        self.assertSetEqual(s.cells, {(0, 1)})
+        self.assertEqual(s.count, 1)
+        self.assertSetEqual(s.known_mines(), {(0, 1)})
+
+    def test_bit_sentence_subtract(self):
+        subset = BitSentence({(1, 0), (1, 1)}, 1, 3)
+        superset = BitSentence({(1, 0), (1, 1), (2, 0), (2, 2)}, 2, 3)
+
+        self.assertTrue(subset.is_subset(superset))
+        self.assertFalse(superset.is_subset(subset))
+        self.assertFalse(subset.is_subset(subset))
+        self.assertEqual(superset.subtract(subset), BitSentence({(2, 0), (2, 2)}, 1, 3))
+
+    def test_bit_board_matches_board(self):
+        for seed in range(10):
+            with self.subTest(seed=seed):
+                random.seed(seed)
+                game = Minesweeper(5, 7, 10)
+                random.seed(seed)
+                bit_game = BitMinesweeper(5, 7, 10)
+
+                self.assertSetEqual(bit_game.mines, game.mines)
+                for i in range(5):
+                    for j in range(7):
+                        self.assertEqual(bit_game.nearby_mines((i, j)), game.nearby_mines((i, j)))
+                        self.assertEqual(bit_game.is_mine((i, j)), game.is_mine((i, j)))
+                self.assertEqual(bit_game.board, game.board)
+                self.assertIs(bit_game.board, bit_game.board)
+
+    def test_bit_ai_matches_ai(self):
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                random.seed(seed)
+                game = BitMinesweeper(8, 8, 8)
+                ai = MinesweeperAI(8, 8, 8)
+                bit_ai = BitMinesweeperAI(8, 8, 8)
+                for cell in sorted({(i, j) for i in range(8) for j in range(8)} - game.mines):
+                    nearby = game.nearby_mines(cell)
+                    ai.add_knowledge(cell, nearby)
+                    bit_ai.add_knowledge(cell, nearby)
+                    self.assertSetEqual(bit_ai.safes, ai.safes)
+                    self.assertSetEqual(bit_ai.mines, ai.mines)
+                    self.assertEqual(
+                        {(frozenset(s.cells), s.count) for s in bit_ai.knowledge},
+                        {(frozenset(s.cells), s.count) for s in ai.knowledge}
+                    )
+
+# End class
+
+
+class SimulateTestCase(unittest.TestCase):
+
+    def test_play_wins(self):
+        won, moves, knowledge_time, moves_made = simulate.play(4, 4, 0, seed=0)
+        self.assertTrue(won)
+        self.assertEqual(moves_made, 16)
+
+    def test_play_with_bits_matches_play(self):
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                won, moves, _, moves_made = simulate.play(8, 8, 8, seed=seed)
+                bit_won, bit_moves, _, bit_moves_made = simulate.play(8, 8, 8, seed=seed, bits=True)
+                self.assertEqual((bit_won, bit_moves, bit_moves_made), (won, moves, moves_made))
+
+    def test_play_is_not_won_if_ai_runs_out_of_moves(self):
+        with patch.object(MinesweeperAI, 'make_safe_move', return_value=None), \
+                patch.object(MinesweeperAI, 'make_random_move', return_value=None):
+            won, moves, knowledge_time, moves_made = simulate.play(4, 4, 2, seed=0)
+        self.assertFalse(won)
+        self.assertEqual(moves, 0)
 
 # End class
 
@@ -302,6 +434,19 @@ def suite():
     suite.addTest(MinesweeperAITestCase('test_make_random_move_returns_valid_cell_if_one_available'))
     suite.addTest(MinesweeperAITestCase('test_make_random_move_returns_valid_cell_if_multiple_available'))
     suite.addTest(MinesweeperAITestCase('test_make_random_move_returns_none_if_none_available'))
+    suite.addTest(MinesweeperAITestCase('test_mine_probabilities_single_sentence'))
+    suite.addTest(MinesweeperAITestCase('test_mine_probabilities_weighted_by_mine_count'))
+    suite.addTest(MinesweeperAITestCase('test_make_random_move_returns_lowest_risk_cell'))
+
+    suite.addTest(BitRepresentationTestCase('test_bit_sentence_cells'))
+    suite.addTest(BitRepresentationTestCase('test_bit_sentence_mark_mine_and_safe'))
+    suite.addTest(BitRepresentationTestCase('test_bit_sentence_subtract'))
+    suite.addTest(BitRepresentationTestCase('test_bit_board_matches_board'))
+    suite.addTest(BitRepresentationTestCase('test_bit_ai_matches_ai'))
+
+    suite.addTest(SimulateTestCase('test_play_wins'))
+    suite.addTest(SimulateTestCase('test_play_with_bits_matches_play'))
+    suite.addTest(SimulateTestCase('test_play_is_not_won_if_ai_runs_out_of_moves'))
     
     return suite
 
@@ -0,0 +1,56 @@
+import sys
+
+import numpy as np
+
+from pagerank import DAMPING, SOLVERS, Graph, crawl_graph, solve
+
+TOLERANCE = 1e-8
+CORPORA = ["corpus0", "corpus1", "corpus2"]
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) not in [1, 3]:
+        sys.exit("Usage: python benchmark.py [pages links]")
+
+    graphs = [(corpus, crawl_graph(corpus)) for corpus in CORPORA]
+    if len(sys.argv) == 3:
+        pages, links = int(sys.argv[1]), int(sys.argv[2])
+        graph = random_graph(pages, links, np.random.default_rng(0))
+        graphs.append((f"random ({pages} pages, {links} links)", graph))
+
+    for name, graph in graphs:
+        print(f"{name}, tolerance {TOLERANCE}")
+        expected, _ = solve(graph, DAMPING, TOLERANCE / 100)
+        for method in SOLVERS:
+            rank, history = solve(graph, DAMPING, TOLERANCE, method)
+            seconds = sum(iteration.seconds for iteration in history)
+            error = np.abs(rank - expected).sum()
+            print(
+                f"  {method:>13}: {len(history):4} iterations, "
+                f"{seconds:8.3f} s, residual {history[-1].residual:.1e}, "
+                f"error {error:.1e}"
+            )
+
+
+def random_graph(pages, links, rng):
+    """
+    Return a random graph with `pages` pages and about `links` links,
+    shaped like a web corpus: most links go to nearby pages, a few popular
+    pages get many links, and a tenth of the pages have no links.
+    """
+    sources = rng.integers(0, pages * 9 // 10, links)
+    offsets = rng.geometric(0.01, links) * rng.choice([-1, 1], links)
+    targets = (sources + offsets) % pages
+    popular = rng.random(links) < 0.2
+    targets[popular] = (pages * rng.random(popular.sum()) ** 4).astype(np.int64)
+
+    # Remove links to the page itself and duplicate links
+    keys = np.unique(sources * pages + targets)
+    keys = keys[keys // pages != keys % pages]
+    return Graph(range(pages), keys // pages, keys % pages)
+
+
+if __name__ == "__main__":
+    main()
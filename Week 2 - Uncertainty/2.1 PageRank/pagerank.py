@@ -1,21 +1,57 @@
+import array
+import collections
+import contextlib
+import itertools
+import mmap
 import os
-import random
 import re
+import struct
 import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
 
 DAMPING = 0.85
 SAMPLES = 10000
+SURFERS = 100000
+BURN_IN = 50
+MMAP_THRESHOLD = 1 << 20
+CRAWL_BATCH = 256
+PUSH_TOLERANCE = 1e-10
+MAX_ITERATIONS = 1000
+GAUSS_SEIDEL_BLOCKS = 64
+EXTRAPOLATION_PERIOD = 10
+ADAPTIVE_FRACTION = 0.5
+EDGE_BLOCK = 1 << 22
+EDGE_BUCKETS_OPEN = 256
+
+LINK = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Edge list files: magic, bytes per page number, pages and links
+EDGES_MAGIC = b"PRE\x01"
+EDGES_HEADER = struct.Struct("<4sIQQ8x")
+
+# Residual and duration of one iteration of a PageRank solver
+Iteration = collections.namedtuple("Iteration", ["residual", "seconds"])
 
 
 def main():
     if len(sys.argv) != 2:
         sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
+    graph = crawl_graph(sys.argv[1])
+    counts = sample_visits(graph, DAMPING, SAMPLES, np.random.default_rng())
+    ranks = dict(zip(graph.pages, counts / SAMPLES))
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+    ranks = dict(zip(graph.pages, power_iteration(graph, DAMPING)))
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
@@ -27,25 +63,363 @@ def crawl(directory):
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
     """
-    pages = dict()
+    return crawl_graph(directory).to_corpus()
 
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
-
-    # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
+
+def crawl_graph(directory, threads=None):
+    """
+    Parse a directory of HTML pages, using a pool of `threads` threads,
+    and return the `Graph` of links between pages of the corpus.
+    Pages are numbered in order of their file names.
+    """
+    with os.scandir(directory) as entries:
+        filenames = sorted(
+            entry.name for entry in entries
+            if entry.name.endswith(".html") and entry.is_file()
         )
+    ids = {filename: i for i, filename in enumerate(filenames)}
+    paths = [os.path.join(directory, filename) for filename in filenames]
 
-    return pages
+    def extract_batch(batch):
+        return [extract_links(path) for path in batch]
+
+    # Files are read in batches, to keep the overhead of the pool low
+    sources = array.array("q")
+    targets = array.array("q")
+    batches = [paths[i:i + CRAWL_BATCH] for i in range(0, len(paths), CRAWL_BATCH)]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        source = 0
+        for batch in executor.map(extract_batch, batches):
+            for links in batch:
+                # Only include links to other pages in the corpus
+                for link in links:
+                    target = ids.get(link)
+                    if target is not None and target != source:
+                        sources.append(source)
+                        targets.append(target)
+                source += 1
+
+    return Graph(filenames, sources, targets)
+
+
+def extract_links(path):
+    """
+    Return the set of link targets in the HTML file at `path`.
+    Large files are memory-mapped and scanned without reading them whole.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            contents = f.read()
+            return {os.fsdecode(link) for link in LINK.findall(contents)}
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as contents:
+            return {os.fsdecode(match.group(1)) for match in LINK.finditer(contents)}
+
+
+class Graph():
+    """
+    Link structure of a corpus, with pages numbered from 0 to N - 1.
+
+    Links are stored as a sparse (CSR) matrix with one row per page:
+    the pages linking to page `p` are `indices[indptr[p]:indptr[p + 1]]`.
+    """
+
+    def __init__(self, pages, sources, targets):
+        """
+        Create a graph of `pages`, with a link from page `sources[k]`
+        to page `targets[k]` (both page numbers) for every k.
+        """
+        self.pages = list(pages)
+        N = len(self.pages)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+
+        if np.all(targets[:-1] <= targets[1:]):
+            self.indices = sources
+        else:
+            self.indices = sources[stable_order(targets, N)]
+        self.indptr = np.zeros(N + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=N), out=self.indptr[1:])
+        self.out_degree = np.bincount(sources, minlength=N)
+        self.dangling = np.flatnonzero(self.out_degree == 0)
+
+        # Rows with at least one link, and where they start in `indices`
+        self.linked = np.flatnonzero(self.indptr[:-1] < self.indptr[1:])
+        self.starts = self.indptr[:-1][self.linked]
+        self._matrix = None
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Create a graph from a corpus dictionary, as returned by `crawl`.
+        Links to pages outside the corpus are ignored.
+        """
+        pages = list(corpus)
+        ids = {page: i for i, page in enumerate(pages)}
+        sources = []
+        targets = []
+        for page in pages:
+            for link in corpus[page]:
+                if link in ids:
+                    sources.append(ids[page])
+                    targets.append(ids[link])
+        return cls(pages, sources, targets)
+
+    def __len__(self):
+        return len(self.pages)
+
+    def links(self):
+        """
+        Return the links as two arrays (sources, targets) of page numbers.
+        """
+        targets = np.repeat(np.arange(len(self.pages)), np.diff(self.indptr))
+        return self.indices, targets
+
+    def to_corpus(self):
+        """
+        Return the graph as a corpus dictionary, mapping each page
+        to the set of pages it links to.
+        """
+        corpus = {page: set() for page in self.pages}
+        sources, targets = self.links()
+        for source, target in zip(sources.tolist(), targets.tolist()):
+            corpus[self.pages[source]].add(self.pages[target])
+        return corpus
+
+    def outbound(self):
+        """
+        Return the links as a CSR matrix by source, (indptr, indices):
+        the pages linked to by page `p` are `indices[indptr[p]:indptr[p + 1]]`.
+        """
+        _, targets = self.links()
+        order = stable_order(self.indices, len(self.pages))
+        indptr = np.zeros(len(self.pages) + 1, dtype=np.int64)
+        np.cumsum(self.out_degree, out=indptr[1:])
+        return indptr, targets[order]
+
+    def matrix(self):
+        """
+        Return the links as a SciPy CSR matrix A (built once), with
+        A[p, q] = 1 if page `q` links to page `p`.
+        """
+        if self._matrix is None:
+            N = len(self.pages)
+            self._matrix = sparse.csr_matrix(
+                (np.ones(len(self.indices)), self.indices, self.indptr), shape=(N, N)
+            )
+        return self._matrix
+
+    def inbound_sum(self, values, rows=None):
+        """
+        Return, for every page, the sum of `values` over the pages linking to it.
+        `values` may be a vector, or a matrix with one row per page.
+        If `rows` (an array of page numbers, or a slice) is given, only
+        return the sums for these pages, in that order.
+        """
+        if values.ndim == 2 and sparse is not None:
+            # A sparse matrix times dense matrix product reads each link
+            # once for all the columns
+            matrix = self.matrix()
+            if rows is not None:
+                matrix = matrix[rows]
+            return np.asarray(matrix @ values)
+        if values.ndim == 2:
+            # Without SciPy: NumPy's reduceat is much slower along the rows
+            # of a matrix than on a vector, so sum the columns one by one,
+            # in a matrix stored column by column (Fortran order)
+            values = np.asfortranarray(values)
+            rows = slice(None) if rows is None else rows
+            result = np.empty_like(values[rows], order="F")
+            for j in range(values.shape[1]):
+                result[:, j] = self.inbound_sum(values[:, j], rows)
+            return result
+        if rows is None:
+            result = np.zeros(values.shape, dtype=np.float64)
+            if len(self.indices):
+                result[self.linked] = np.add.reduceat(
+                    values[self.indices], self.starts, axis=0
+                )
+            return result
+
+        if isinstance(rows, slice):
+            # The links of consecutive rows are already consecutive
+            start, stop, _ = rows.indices(len(self.pages))
+            lengths = np.diff(self.indptr[start:stop + 1])
+            offsets = self.indptr[start:stop] - self.indptr[start]
+            positions = slice(self.indptr[start], self.indptr[stop])
+        else:
+            # Gather the links of the selected rows, one row after the other
+            starts = self.indptr[rows]
+            lengths = self.indptr[rows + 1] - starts
+            offsets = np.cumsum(lengths) - lengths
+            positions = np.arange(lengths.sum()) + np.repeat(starts - offsets, lengths)
+        result = np.zeros((len(lengths),) + values.shape[1:], dtype=np.float64)
+        linked = np.flatnonzero(lengths)
+        if len(linked):
+            result[linked] = np.add.reduceat(
+                values[self.indices[positions]], offsets[linked], axis=0
+            )
+        return result
+
+    def step(self, rank, damping_factor, rows=None, teleport=None):
+        """
+        Return the PageRank values after one iteration starting from `rank`.
+        A page without links is treated as linking to every page: its rank
+        is spread evenly over all pages (a rank-one correction).
+        If `rows` is given, only return the new values of these pages.
+
+        If `teleport` is given, the random surfer jumps (and leaves pages
+        without links) to page `p` with probability `teleport[p]` rather
+        than 1 / N. When `rank` is a matrix, `teleport` is a matrix too,
+        with one teleport vector per column. `teleport` always has one row
+        per page, even if `rows` is given.
+        """
+        N = len(self)
+        if teleport is None:
+            teleport = 1 / N
+        elif rows is not None:
+            teleport = teleport[rows]
+        out_degree = self.out_degree.reshape((-1,) + (1,) * (rank.ndim - 1))
+        shares = np.divide(rank, out_degree, out=np.zeros_like(rank), where=out_degree > 0)
+        dangling = rank[self.dangling].sum(axis=0)
+
+        # (1 - d) * teleport + d * (sums + dangling * teleport), with as few
+        # temporary arrays as possible
+        new_rank = self.inbound_sum(shares, rows)
+        new_rank *= damping_factor
+        new_rank += ((1 - damping_factor) + damping_factor * dangling) * teleport
+        return new_rank
+
+
+class EdgeList():
+    """
+    Link structure of a corpus stored on disk, as written by `write_edges`:
+    a binary list of (source, target) page numbers sorted by target.
+
+    The file is memory-mapped and read `block` links at a time, so that
+    only vectors with one value per page are kept in memory: an iteration
+    needs about 8 bytes per page for each vector (ranks, shares, sums,
+    out-degrees) plus about 40 bytes per link of a block, whatever the
+    number of links.
+    """
+
+    def __init__(self, filename, block=EDGE_BLOCK):
+        """
+        Open the edge list in `filename`, and count the links of every
+        page in a first pass over the file.
+        """
+        with open(filename, "rb") as f:
+            header = f.read(EDGES_HEADER.size)
+        if len(header) < EDGES_HEADER.size or header[:4] != EDGES_MAGIC:
+            raise ValueError(f"{filename} is not an edge list")
+        _, itemsize, self.N, self.E = EDGES_HEADER.unpack(header)
+        self.edges = np.memmap(
+            filename, dtype=f"<u{itemsize}", mode="r",
+            offset=EDGES_HEADER.size, shape=(self.E, 2)
+        ) if self.E else np.zeros((0, 2), dtype=np.int64)
+        self.block = block
+
+        self.out_degree = np.zeros(self.N, dtype=np.int64)
+        for sources, _ in self.blocks():
+            self.out_degree += np.bincount(sources, minlength=self.N)
+        self.dangling = np.flatnonzero(self.out_degree == 0)
+
+    def __len__(self):
+        return self.N
+
+    def blocks(self):
+        """
+        Yield the links as arrays (sources, targets), `block` links at a time.
+        """
+        for start in range(0, self.E, self.block):
+            edges = np.array(self.edges[start:start + self.block], dtype=np.int64)
+            yield edges[:, 0], edges[:, 1]
+
+    def inbound_sum(self, values, rows=None):
+        """
+        Return, for every page, the sum of the vector `values` over the
+        pages linking to it. Selecting `rows` is not supported.
+        """
+        if rows is not None:
+            raise ValueError("EdgeList only sums over all pages")
+        result = np.zeros(self.N)
+        for sources, targets in self.blocks():
+            # Targets are sorted, so a block only covers a range of pages
+            first = targets[0]
+            sums = np.bincount(targets - first, weights=values[sources])
+            result[first:first + len(sums)] += sums
+        return result
+
+    step = Graph.step
+
+
+def write_edges(filename, pages, chunks, block=EDGE_BLOCK):
+    """
+    Write an edge list of `pages` pages to `filename`, for `EdgeList`.
+    `chunks` is an iterable of arrays (sources, targets) of page numbers,
+    such as `[graph.links()]`, which may be larger than memory together.
+
+    The links are sorted on disk: they are first copied to a temporary
+    file while counting the links to every page, then split into buckets
+    of consecutive targets with about `block` links each, and every
+    bucket is sorted in memory and appended to the file. The buckets are
+    written `EDGE_BUCKETS_OPEN` at a time, one pass over the links each,
+    to stay within the limit on open files.
+    """
+    dtype = np.dtype("<u4") if pages <= 1 << 32 else np.dtype("<u8")
+    directory = os.path.dirname(os.path.abspath(filename))
+    with tempfile.TemporaryDirectory(dir=directory) as temporary:
+
+        # Copy the links and count the links to every page
+        inbound = np.zeros(pages, dtype=np.int64)
+        unsorted = os.path.join(temporary, "unsorted")
+        with open(unsorted, "wb") as f:
+            for sources, targets in chunks:
+                edges = np.column_stack([sources, targets]).astype(dtype)
+                inbound += np.bincount(edges[:, 1], minlength=pages)
+                edges.tofile(f)
+        E = int(inbound.sum())
+
+        # Split pages into ranges with about `block` links to them
+        ends = np.cumsum(inbound)
+        bounds = np.unique(np.searchsorted(
+            ends, np.arange(block, E, block), side="right"
+        ))
+        buckets = [os.path.join(temporary, str(i)) for i in range(len(bounds) + 1)]
+        for first in range(0, len(buckets), EDGE_BUCKETS_OPEN):
+            batch = buckets[first:first + EDGE_BUCKETS_OPEN]
+            with contextlib.ExitStack() as stack:
+                files = [stack.enter_context(open(bucket, "wb")) for bucket in batch]
+                edges = np.memmap(unsorted, dtype=dtype, mode="r", shape=(E, 2)) if E else []
+                for start in range(0, E, block):
+                    chunk = np.asarray(edges[start:start + block])
+                    bucket = np.searchsorted(bounds, chunk[:, 1], side="right") - first
+                    in_batch = (bucket >= 0) & (bucket < len(batch))
+                    chunk, bucket = chunk[in_batch], bucket[in_batch]
+                    order = stable_order(bucket, len(batch))
+                    splits = np.searchsorted(bucket[order], np.arange(1, len(batch)))
+                    for f, part in zip(files, np.split(chunk[order], splits)):
+                        part.tofile(f)
+                del edges
+
+        # Sort every bucket by target, then source
+        with open(filename, "wb") as f:
+            f.write(EDGES_HEADER.pack(EDGES_MAGIC, dtype.itemsize, pages, E))
+            for bucket in buckets:
+                edges = np.fromfile(bucket, dtype=dtype).reshape(-1, 2)
+                order = np.lexsort((edges[:, 0], edges[:, 1]))
+                edges[order].tofile(f)
+
+
+def stable_order(keys, n):
+    """
+    Return the indices that would sort `keys`, integers from 0 to n - 1,
+    keeping equal keys in their original order.
+    """
+    E = len(keys)
+    if n * E >= 2 ** 63:
+        return np.argsort(keys, kind="stable")
+    # Sorting unique composite keys is much faster than a stable argsort
+    return np.sort(keys * E + np.arange(E)) % E
 
 
 def transition_model(corpus, page, damping_factor):
@@ -81,71 +455,544 @@ def transition_model(corpus, page, damping_factor):
     return dist
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, seed=None, surfers=SURFERS):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
 
+    The samples are generated by up to `surfers` independent random
+    surfers moving in parallel, with a NumPy random generator seeded
+    by `seed`.
+
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    # init a dictionary with same keys as corpus and 0 values
-    rank = dict.fromkeys(corpus.keys(), 0)
-
-    # The first sample is generated by choosing from a page at random
-    pages = list(corpus.keys())
-    page = random.choice(pages)
-    rank[page] = rank[page] + 1 # increment page counter
-    dist = transition_model(corpus, page, damping_factor)
-
-    # remaining samples are generated from the previous sample based on the previous sample?s transition model
-    count = 2
-    while count <= n:
-        population = list(dist.keys())
-        weights = list(dist.values())
-        page = random.choices(population, weights, k=1)[0]
-        rank[page] = rank[page] + 1 # increment page counter
-        dist = transition_model(corpus, page, damping_factor)
-        count += 1 # increment sample counter
-
-    # normalize rank
-    for page in rank.keys():
-        rank[page] = rank[page] / n
+    graph = Graph.from_corpus(corpus)
+    counts = sample_visits(graph, damping_factor, n, np.random.default_rng(seed), surfers)
+    return dict(zip(graph.pages, (counts / n).tolist()))
 
-    return rank
 
+def sample_visits(graph, damping_factor, n, rng, surfers=SURFERS):
+    """
+    Return the number of visits of each page of `graph` over `n` samples
+    taken by parallel random surfers. Each surfer starts on a random page
+    and walks `BURN_IN` steps before its visits are counted, so that the
+    samples do not depend on where the surfers started.
+    """
+    N = len(graph)
+    out_indptr, out_indices = graph.outbound()
+    out_degree = graph.out_degree
+    # Every surfer takes at least 100 samples
+    surfers = max(1, min(surfers, n // 100))
+
+    def walk(pages):
+        """Move every surfer one step according to the transition model."""
+        # With probability `damping_factor`, follow a random link of the
+        # current page (if it has any); otherwise jump to a random page
+        degree = out_degree[pages]
+        follow = (rng.random(surfers) < damping_factor) & (degree > 0)
+        link = out_indptr[pages[follow]] + (
+            rng.random(follow.sum()) * degree[follow]
+        ).astype(np.int64)
+        pages = rng.integers(N, size=surfers)
+        pages[follow] = out_indices[link]
+        return pages
+
+    pages = rng.integers(N, size=surfers)
+    for _ in range(BURN_IN):
+        pages = walk(pages)
+
+    counts = np.zeros(N, dtype=np.int64)
+    sampled = 0
+    while True:
+        # Count the current page of each surfer, up to `n` samples in total
+        visits = pages[:n - sampled]
+        counts += np.bincount(visits, minlength=N)
+        sampled += len(visits)
+        if sampled == n:
+            return counts
+        pages = walk(pages)
 
-def iterate_pagerank(corpus, damping_factor):
+
+def iterate_pagerank(corpus, damping_factor, tolerance=0.001, method="power"):
     """
     Return PageRank values for each page by iteratively updating
-    PageRank values until convergence.
+    PageRank values until convergence, i.e. until the values change
+    by no more than `tolerance` in total (L1 norm). `method` is the
+    name of one of the `SOLVERS`.
 
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    N = len(corpus)
-    pages = corpus.keys()
-    rank = dict.fromkeys(corpus.keys(), 1/N)
-    
-    # A page that has no links at all should be interpreted as having one link for every page in the corpus (including itself).
-    amended_corpus = get_amended_corpus(corpus)
+    graph = Graph.from_corpus(corpus)
+    rank, _ = solve(graph, damping_factor, tolerance, method)
+    return dict(zip(graph.pages, rank.tolist()))
+
+
+def power_iteration(graph, damping_factor, tolerance=0.001):
+    """
+    Return the vector of PageRank values of `graph`, starting from
+    1 / N for every page and iterating until the values change by
+    no more than `tolerance` in total (L1 norm).
+    """
+    rank, _ = solve(graph, damping_factor, tolerance)
+    return rank
+
+
+def solve(graph, damping_factor, tolerance=0.001, method="power",
+          max_iterations=MAX_ITERATIONS):
+    """
+    Compute the PageRank values of `graph` with the solver `method`, one
+    of the `SOLVERS`, until the residual (the L1 norm of the change made
+    by an iteration) is at most `tolerance`, or for `max_iterations`.
+    An `EdgeList` only supports the `EDGE_LIST_SOLVERS`, which update all
+    pages at once; other methods raise ValueError.
+
+    Return a tuple (rank, history): the vector of PageRank values, and
+    a list with the residual and duration (in seconds) of each iteration.
+    """
+    if isinstance(graph, EdgeList) and method not in EDGE_LIST_SOLVERS:
+        raise ValueError(f"solver {method!r} does not support an EdgeList")
+    history = []
+    start = time.perf_counter()
+    for rank, residual in SOLVERS[method](graph, damping_factor, tolerance):
+        now = time.perf_counter()
+        history.append(Iteration(residual, now - start))
+        start = now
+        if residual <= tolerance or len(history) == max_iterations:
+            return rank / rank.sum(), history
+
+
+def power_steps(graph, damping_factor, tolerance):
+    """
+    Power iteration: apply `Graph.step` to all pages at once.
+    Yield the PageRank values and the residual after every iteration.
+    """
+    N = len(graph)
+    rank = np.full(N, 1 / N)
+    while True:
+        new_rank = graph.step(rank, damping_factor)
+        residual = np.abs(new_rank - rank).sum()
+        rank = new_rank
+        yield rank, residual
+
 
+def gauss_seidel_steps(graph, damping_factor, tolerance):
+    """
+    Block Gauss-Seidel: update the pages in up to `GAUSS_SEIDEL_BLOCKS`
+    consecutive blocks, each using the values already updated in this
+    iteration. Yield the PageRank values and the residual after every
+    iteration.
+    """
+    N = len(graph)
+    d = damping_factor
+    rank = np.full(N, 1 / N)
+    out_degree = graph.out_degree
+    shares = np.divide(rank, out_degree, out=np.zeros(N), where=out_degree > 0)
+    is_dangling = out_degree == 0
+    dangling = rank[is_dangling].sum()
+    bounds = np.linspace(0, N, min(N, GAUSS_SEIDEL_BLOCKS) + 1).astype(np.int64)
+    blocks = [slice(a, b) for a, b in zip(bounds[:-1], bounds[1:])]
+    while True:
+        old_rank = rank.copy()
+        for rows in blocks:
+            new_rank = (1 - d) / N + d * (
+                graph.inbound_sum(shares, rows) + dangling / N
+            )
+            dangling += (new_rank - rank[rows])[is_dangling[rows]].sum()
+            rank[rows] = new_rank
+            shares[rows] = np.divide(
+                new_rank, out_degree[rows], out=np.zeros(len(new_rank)),
+                where=out_degree[rows] > 0
+            )
+
+        # Unlike power iteration, a sweep does not keep the sum at 1
+        total = rank.sum()
+        rank /= total
+        shares /= total
+        dangling /= total
+        yield rank, np.abs(rank - old_rank).sum()
+
+
+def extrapolation_steps(graph, damping_factor, tolerance):
+    """
+    Power iteration with quadratic extrapolation every
+    `EXTRAPOLATION_PERIOD` iterations, from the last four iterates.
+    Yield the PageRank values and the residual after every iteration.
+    """
+    N = len(graph)
+    rank = np.full(N, 1 / N)
+    iterates = collections.deque([rank], maxlen=4)
+    iteration = 0
     while True:
-        current_rank = rank
-        new_rank = dict.fromkeys(amended_corpus.keys(), 0)
-        # update PageRanks
-        for page in pages:            
-            new_rank[page] = get_page_rank(page, amended_corpus, current_rank, damping_factor)
+        iteration += 1
+        if iteration % EXTRAPOLATION_PERIOD == 0 and len(iterates) == 4:
+            rank = quadratic_extrapolation(*iterates)
+        new_rank = graph.step(rank, damping_factor)
+        residual = np.abs(new_rank - rank).sum()
         rank = new_rank
-        # check threshold, break if all values are below
-        if change_below_threshold(current_rank.values(), new_rank.values(), 0.001):
-            break
-    
+        iterates.append(rank)
+        yield rank, residual
+
+
+def quadratic_extrapolation(x0, x1, x2, x3):
+    """
+    Return the quadratic extrapolation of four successive iterates
+    x0 to x3, which removes the components of the error along the two
+    subdominant eigenvectors. Return x3 if the extrapolation fails.
+    """
+    Y = np.column_stack([x1 - x0, x2 - x0])
+    (g1, g2), *_ = np.linalg.lstsq(Y, x0 - x3, rcond=None)
+    x = (g1 + g2 + 1) * x1 + (g2 + 1) * x2 + x3
+    x = np.maximum(x, 0)
+    total = x.sum()
+    if not np.isfinite(total) or total <= 0:
+        return x3
+    return x / total
+
+
+def adaptive_steps(graph, damping_factor, tolerance):
+    """
+    Adaptive PageRank: a page whose value changed by no more than its share
+    of the tolerance, `tolerance` / N, in an iteration is frozen, and only
+    the other pages are updated. Updating a few pages is only worth it if they
+    have at most `ADAPTIVE_FRACTION` of the links; otherwise all pages are
+    updated. Once the change of the updated pages is at most `tolerance`,
+    all pages are updated again (and the frozen pages reconsidered), so
+    that the residual is only small when it is small for all pages.
+    Yield the PageRank values and the residual after every iteration.
+    """
+    N = len(graph)
+    inbound = np.diff(graph.indptr)
+    freeze = tolerance / N
+    rank = np.full(N, 1 / N)
+    active = np.arange(N)
+    while True:
+        if inbound[active].sum() <= ADAPTIVE_FRACTION * len(graph.indices):
+            new_rank = graph.step(rank, damping_factor, active)
+            change = np.abs(new_rank - rank[active])
+            residual = change.sum()
+            if residual > tolerance:
+                # Updating some pages does not keep the sum at 1, which
+                # Graph.step relies on for the teleport term
+                rank = rank.copy()
+                rank[active] = new_rank
+                rank /= rank.sum()
+                active = active[change > freeze]
+                yield rank, residual
+                continue
+        new_rank = graph.step(rank, damping_factor)
+        change = np.abs(new_rank - rank)
+        residual = change.sum()
+        rank = new_rank
+        active = np.flatnonzero(change > freeze)
+        if len(active) == 0:
+            active = np.arange(N)
+        yield rank, residual
+
+
+SOLVERS = {
+    "power": power_steps,
+    "gauss-seidel": gauss_seidel_steps,
+    "extrapolation": extrapolation_steps,
+    "adaptive": adaptive_steps,
+}
+
+# Solvers that only need Graph.step on all pages, as EdgeList provides
+EDGE_LIST_SOLVERS = ("power", "extrapolation")
+
+
+def topic_pagerank(corpus, damping_factor, topics, tolerance=0.001):
+    """
+    Return topic-sensitive PageRank values: for every topic, the PageRank
+    values when the random surfer only jumps to the pages of that topic.
+    `topics` maps topic names to non-empty sets of pages of the corpus.
+    Raise ValueError for an empty topic, and KeyError for a page that is
+    not in the corpus.
+
+    Return a dictionary where keys are topic names, and values are
+    dictionaries mapping page names to their PageRank value for the topic.
+    """
+    graph = Graph.from_corpus(corpus)
+    ids = {page: i for i, page in enumerate(graph.pages)}
+    teleport = np.zeros((len(graph), len(topics)))
+    for j, (topic, pages) in enumerate(topics.items()):
+        if not pages:
+            raise ValueError(f"topic {topic!r} has no pages")
+        teleport[[ids[page] for page in pages], j] = 1
+    rank = personalized_ranks(graph, damping_factor, teleport, tolerance)
+    return {
+        topic: dict(zip(graph.pages, rank[:, j].tolist()))
+        for j, topic in enumerate(topics)
+    }
+
+
+def personalized_ranks(graph, damping_factor, teleport, tolerance=0.001,
+                       max_iterations=MAX_ITERATIONS):
+    """
+    Return the personalised PageRank values of `graph` for a batch of
+    teleport vectors, given as the columns of the matrix `teleport`
+    (one row per page; each column is normalised to sum to 1). Raise
+    ValueError if a column sums to 0, as it has no page to jump to.
+
+    All vectors are solved together by power iteration on a matrix of
+    ranks, so that each link is read once per iteration for the whole
+    batch. A column stops being updated once it changes by no more than
+    `tolerance` (L1 norm). Return a matrix with the same shape as
+    `teleport`, whose column j holds the PageRank values for column j
+    (or a vector, if `teleport` is a single vector).
+    """
+    teleport = np.asarray(teleport, dtype=np.float64)
+    if teleport.ndim == 1:
+        return personalized_ranks(
+            graph, damping_factor, teleport[:, np.newaxis], tolerance,
+            max_iterations
+        )[:, 0]
+    totals = teleport.sum(axis=0)
+    if (totals == 0).any():
+        raise ValueError(
+            f"teleport vector {np.flatnonzero(totals == 0)[0]} sums to 0"
+        )
+    teleport = teleport / totals
+    rank = np.empty_like(teleport)
+
+    # Graph.step, inlined to reuse the same buffers in every iteration:
+    # a batch of ranks is too large for the cache, and fresh temporary
+    # matrices cost more than the sparse product itself
+    N = len(graph)
+    inverse = np.divide(
+        1.0, graph.out_degree, out=np.zeros(N), where=graph.out_degree > 0
+    )[:, np.newaxis]
+    active = np.arange(teleport.shape[1])
+    current = teleport.copy()
+    buffer = np.empty_like(current)
+    for _ in range(max_iterations):
+        np.multiply(current, inverse, out=buffer)
+        new_rank = graph.inbound_sum(buffer)
+        dangling = current[graph.dangling].sum(axis=0)
+        new_rank *= damping_factor
+        new_rank += np.multiply(
+            teleport, (1 - damping_factor) + damping_factor * dangling, out=buffer
+        )
+        np.subtract(new_rank, current, out=buffer)
+        residual = np.abs(buffer, out=buffer).sum(axis=0)
+        current = new_rank
+
+        # Set converged columns aside
+        converged = residual <= tolerance
+        if converged.any():
+            rank[:, active[converged]] = current[:, converged]
+            active = active[~converged]
+            current = current[:, ~converged]
+            teleport = teleport[:, ~converged]
+            buffer = np.empty_like(current)
+            if len(active) == 0:
+                break
+    rank[:, active] = current
     return rank
 
 
+def mix_ranks(graph, damping_factor, ranks, weights):
+    """
+    Return the personalised PageRank values of `graph` for teleport
+    vectors that are mixtures of the teleport vectors of `ranks`, the
+    matrix returned by `personalized_ranks`. `weights` holds one weight
+    per column of `ranks` (or one column of weights per mixture).
+
+    Personalised PageRank values are proportional to a linear function
+    of the teleport vector, y = (I - damping_factor * A)^-1 teleport, with
+    rank = c * y where c = 1 - damping_factor + damping_factor * (rank of
+    the pages without links). So mixtures only cost a matrix product.
+    """
+    c = (1 - damping_factor) + damping_factor * ranks[graph.dangling].sum(axis=0)
+    mixed = (ranks / c) @ np.asarray(weights, dtype=np.float64)
+    return mixed / mixed.sum(axis=0)
+
+
+def save_ranks(filename, graph, rank):
+    """
+    Save `graph` and its PageRank values `rank` to a NumPy .npz file,
+    so that they can be updated later with `update_pagerank`.
+    """
+    sources, targets = graph.links()
+    np.savez(
+        filename, pages=np.array(graph.pages), sources=sources,
+        targets=targets, rank=rank
+    )
+
+
+def load_ranks(filename):
+    """
+    Load a graph and its PageRank values saved by `save_ranks`.
+    Return a tuple (graph, rank).
+    """
+    with np.load(filename) as data:
+        graph = Graph(data["pages"].tolist(), data["sources"], data["targets"])
+        return graph, data["rank"]
+
+
+def update_pagerank(graph, rank, damping_factor, add_pages=(), remove_pages=(),
+                    add_links=(), remove_links=(), tolerance=PUSH_TOLERANCE):
+    """
+    Update the PageRank values `rank` of `graph` after a change of the corpus,
+    without recomputing them from scratch.
+
+    `add_pages` and `remove_pages` are iterables of page names; `add_links`
+    and `remove_links` are iterables of (source, target) pairs of page
+    names, and may be generators: each is read once. Pages that
+    appear in `add_links` are added to the corpus if needed, and the links
+    of removed pages are removed as well. A link that is both removed and
+    added is kept.
+
+    Return a tuple (graph, rank, error) with the new graph, its PageRank
+    values and a bound on the error they add.
+
+    PageRank values are proportional to the solution y of
+    y = 1 + damping_factor * A y, where A holds the links of pages that
+    have links (a page without links is accounted for by normalising y).
+    Starting from the old values, only the pages whose equation changed get
+    a non-zero residual r = 1 + damping_factor * A y - y. The residuals are
+    then pushed (forward push, in the order they become active) to the pages
+    linked to, until every residual is at most `tolerance` times sum(y),
+    i.e. `tolerance` in units of PageRank. As y* - y =
+    (I - damping_factor * A)^-1 r, the L1 error of the returned (normalised)
+    values, on top of the error already present in `rank`, is at most
+    `error` = 2 * sum(|r|) / ((1 - damping_factor) * sum(y)).
+    """
+    N = len(graph)
+    d = damping_factor
+
+    # The changes are read more than once
+    add_pages, remove_pages = list(add_pages), list(remove_pages)
+    add_links, remove_links = list(add_links), list(remove_links)
+
+    # Unnormalised values of the old graph: rank = c * y
+    c = ((1 - d) + d * rank[graph.dangling].sum()) / N
+    old_y = rank / c
+
+    # Find the pages named in the changes, in a single pass over the pages
+    removed_pages = set(remove_pages)
+    named = removed_pages.union(add_pages, *add_links, *remove_links)
+    old_ids = {
+        page: i for i, page in enumerate(graph.pages) if page in named
+    }
+
+    # Number the pages of the new corpus: kept pages first, in order, then
+    # new pages. `renumber` maps old page numbers to new ones (or -1).
+    removed_ids = np.array(sorted(
+        old_ids[page] for page in removed_pages if page in old_ids
+    ), dtype=np.int64)
+    renumber = np.arange(N) - np.searchsorted(removed_ids, np.arange(N))
+    renumber[removed_ids] = -1
+    pages = [page for page in graph.pages if page not in removed_pages]
+    ids = {
+        page: int(renumber[i]) for page, i in old_ids.items()
+        if page not in removed_pages
+    }
+    new_pages = []
+    for page in itertools.chain(add_pages, *add_links):
+        if page not in ids and page not in removed_pages:
+            ids[page] = len(pages)
+            pages.append(page)
+            new_pages.append(ids[page])
+
+    def position(source, target):
+        """Return the index in `graph.indices` of a link, or None."""
+        if source not in old_ids or target not in old_ids:
+            return None
+        start, end = graph.indptr[old_ids[target]:old_ids[target] + 2]
+        found = np.flatnonzero(graph.indices[start:end] == old_ids[source])
+        return start + found[0] if len(found) else None
+
+    # Links of the new corpus: the links of `graph` between kept pages,
+    # less the removed links, plus the added links
+    old_sources, old_targets = graph.links()
+    sources = renumber[old_sources]
+    targets = renumber[old_targets]
+    kept = (sources >= 0) & (targets >= 0)
+    removed = set()
+    for source, target in remove_links:
+        k = position(source, target)
+        if k is not None and kept[k]:
+            kept[k] = False
+            removed.add((ids[source], ids[target]))
+    added = set()
+    for source, target in add_links:
+        if source != target and source in ids and target in ids:
+            link = (ids[source], ids[target])
+            k = position(source, target)
+            if k is None:
+                added.add(link)
+            elif not kept[k]:
+                kept[k] = True
+                removed.discard(link)
+
+    # Kept links are still sorted by target: insert the added links in order
+    added_sources, added_targets = np.array(
+        sorted(added, key=lambda link: link[1]), dtype=np.int64
+    ).reshape(-1, 2).T
+    insert = np.searchsorted(targets[kept], added_targets, side="right")
+    new_graph = Graph(
+        pages,
+        np.insert(sources[kept], insert, added_sources),
+        np.insert(targets[kept], insert, added_targets)
+    )
+
+    # Pages whose links changed, and the pages they link or linked to
+    changed = removed | added
+    lost_targets = targets[(sources < 0) & (targets >= 0)]
+    lost_sources = sources[(sources >= 0) & (targets < 0)]
+    out_indptr, out_indices = new_graph.outbound()
+    affected = np.unique(np.concatenate([
+        np.array(new_pages + [target for _, target in changed], dtype=np.int64),
+        lost_targets,
+        *(out_indices[out_indptr[u]:out_indptr[u + 1]] for u in
+          set(lost_sources.tolist()) | {source for source, _ in changed}),
+    ]))
+
+    # Residuals of the affected pages, starting from the old values
+    M = len(pages)
+    y = np.zeros(M)
+    y[renumber[renumber >= 0]] = old_y[renumber >= 0]
+    out_degree = new_graph.out_degree
+    shares = np.divide(y, out_degree, out=np.zeros(M), where=out_degree > 0)
+    residual = [0.0] * M
+    for v in affected.tolist():
+        inbound = new_graph.indices[new_graph.indptr[v]:new_graph.indptr[v + 1]]
+        residual[v] = 1 + d * shares[inbound].sum() - y[v]
+
+    # Forward push, until residuals are small compared to the values
+    threshold = tolerance * (y.sum() + sum(residual))
+    out_indptr = out_indptr.tolist()
+    out_degree = out_degree.tolist()
+    values = y.tolist()
+    queue = collections.deque(
+        v for v in affected.tolist() if abs(residual[v]) > threshold
+    )
+    queued = set(queue)
+    while queue:
+        u = queue.popleft()
+        queued.discard(u)
+        r = residual[u]
+        residual[u] = 0.0
+        values[u] += r
+        if out_degree[u] == 0:
+            continue
+        share = d * r / out_degree[u]
+        for v in out_indices[out_indptr[u]:out_indptr[u + 1]].tolist():
+            residual[v] += share
+            if abs(residual[v]) > threshold and v not in queued:
+                queue.append(v)
+                queued.add(v)
+
+    y = np.array(values)
+    total = y.sum()
+    error = 2 * np.abs(residual).sum() / ((1 - d) * total)
+    return new_graph, y / total, error
+
+
 def get_amended_corpus(corpus):
     """
     Returns a modified corpus where empty sets (i.e. pages with no links) are replaced with links to every page.
@@ -171,7 +1018,7 @@ def change_below_threshold(current_values, new_values, threshold):
     """
     Returns true if change between the current values and the new values are all below threshold (inclusive).
     """
-    differences = [i - j for i, j in zip(new_values, current_values)]
+    differences = [abs(i - j) for i, j in zip(new_values, current_values)]
     return all(i <= threshold for i in differences)  
 
 
@@ -1,4 +1,9 @@
+import os
+import tempfile
 import unittest
+from unittest.mock import patch
+
+import numpy as np
 
 import pagerank as pr
 
@@ -79,6 +84,27 @@ class TransitionModelTestCase(unittest.TestCase):
 
 # End class
 
+class CrawlTestCase(unittest.TestCase):
+
+    def test_crawl(self):
+        expected = {
+            '1.html': {'2.html'},
+            '2.html': {'1.html', '3.html'},
+            '3.html': {'2.html', '4.html'},
+            '4.html': {'2.html'}
+        }
+        self.assertDictEqual(pr.crawl('corpus0'), expected)
+
+    def test_crawl_graph(self):
+        graph = pr.crawl_graph('corpus2')
+
+        self.assertListEqual(graph.pages, sorted(graph.pages))
+        self.assertEqual(len(graph), 8)
+        self.assertEqual(graph.out_degree.sum(), 11)
+        self.assertListEqual(graph.dangling.tolist(), [graph.pages.index('recursion.html')])
+
+# End class
+
 class SamplePagerankTestCase(unittest.TestCase):
 
     @classmethod
@@ -109,6 +135,25 @@ class SamplePagerankTestCase(unittest.TestCase):
                 values = list(rank.values())
                 self.assertAlmostEqual(sum(values), 1)
 
+    def test_seed_is_reproducible(self):
+        corpuses = [self.corpus0, self.corpus1, self.corpus2, self.corpus3]
+
+        for corpus in corpuses:
+            with self.subTest(corpus=corpus):
+                rank1 = pr.sample_pagerank(corpus, 0.85, 10000, seed=1)
+                rank2 = pr.sample_pagerank(corpus, 0.85, 10000, seed=1)
+                self.assertDictEqual(rank1, rank2)
+
+    def test_ranks_close_to_iteration(self):
+        corpuses = [self.corpus0, self.corpus1, self.corpus2, self.corpus3]
+
+        for corpus in corpuses:
+            with self.subTest(corpus=corpus):
+                rank = pr.sample_pagerank(corpus, 0.85, 1000000, seed=0)
+                expected = pr.iterate_pagerank(corpus, 0.85, tolerance=1e-10)
+                for page in corpus:
+                    self.assertAlmostEqual(rank[page], expected[page], places=2)
+
 # End class
 
 class IteratePagerankTestCase(unittest.TestCase):
@@ -168,6 +213,315 @@ class IteratePagerankTestCase(unittest.TestCase):
                 values = list(rank.values())
                 self.assertAlmostEqual(sum(values), 1)
 
+    def test_graph_step_matches_get_page_rank(self):
+        corpuses = [self.corpus0, self.corpus1, self.corpus2, self.corpus3]
+
+        for corpus in corpuses:
+            with self.subTest(corpus=corpus):
+                graph = pr.Graph.from_corpus(corpus)
+                N = len(graph)
+                result = graph.step(np.full(N, 1 / N), 0.85)
+                amended_corpus = pr.get_amended_corpus(corpus)
+                current_rank = dict.fromkeys(amended_corpus.keys(), 1/N)
+                for i, page in enumerate(graph.pages):
+                    expected = pr.get_page_rank(page, amended_corpus, current_rank, 0.85)
+                    self.assertAlmostEqual(result[i], expected)
+
+    def test_converges_to_fixed_point(self):
+        corpuses = [self.corpus0, self.corpus1, self.corpus2, self.corpus3]
+
+        for corpus in corpuses:
+            with self.subTest(corpus=corpus):
+                rank = pr.iterate_pagerank(corpus, 0.85, tolerance=1e-10)
+                amended_corpus = pr.get_amended_corpus(corpus)
+                for page in corpus:
+                    expected = pr.get_page_rank(page, amended_corpus, rank, 0.85)
+                    self.assertAlmostEqual(rank[page], expected, places=8)
+
+    def test_change_below_threshold(self):
+        self.assertTrue(pr.change_below_threshold([0.5, 0.5], [0.5005, 0.4995], 0.001))
+        self.assertFalse(pr.change_below_threshold([0.5, 0.5], [0.6, 0.4], 0.001))
+
+# End class
+
+class SolverTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.graphs = [pr.crawl_graph(corpus) for corpus in ['corpus0', 'corpus1', 'corpus2']]
+
+    def test_solvers_agree(self):
+        for graph in self.graphs:
+            expected, _ = pr.solve(graph, 0.85, 1e-12)
+            for method in pr.SOLVERS:
+                with self.subTest(pages=graph.pages, method=method):
+                    rank, _ = pr.solve(graph, 0.85, 1e-10, method)
+                    self.assertAlmostEqual(rank.sum(), 1)
+                    np.testing.assert_allclose(rank, expected, atol=1e-9)
+
+    def test_history(self):
+        for graph in self.graphs:
+            for method in pr.SOLVERS:
+                with self.subTest(pages=graph.pages, method=method):
+                    _, history = pr.solve(graph, 0.85, 1e-6, method)
+                    self.assertLessEqual(history[-1].residual, 1e-6)
+                    self.assertTrue(all(i.residual > 1e-6 for i in history[:-1]))
+                    self.assertTrue(all(i.seconds >= 0 for i in history))
+
+    def test_adaptive_freezes_converged_pages(self):
+        # A chain of pages converges one page per iteration, then feeds
+        # a clique that keeps changing
+        corpus = {f"{i}.html": {f"{i + 1}.html"} for i in range(20)}
+        corpus["20.html"] = {"a.html"}
+        clique = ["a.html", "b.html", "c.html", "d.html", "e.html"]
+        for page in clique:
+            corpus[page] = set(clique) - {page}
+        graph = pr.Graph.from_corpus(corpus)
+        expected, _ = pr.solve(graph, 0.85, 1e-12)
+
+        with patch.object(pr.Graph, 'step', autospec=True, side_effect=pr.Graph.step) as step:
+            rank, _ = pr.solve(graph, 0.85, 1e-6, 'adaptive')
+        # step(graph, rank, damping_factor, rows) for the active pages only
+        rows = [call.args[3] for call in step.call_args_list if len(call.args) > 3]
+        self.assertTrue(any(len(r) < len(graph) for r in rows))
+        self.assertLessEqual(np.abs(rank - expected).sum(), 1e-6)
+
+    def test_max_iterations(self):
+        _, history = pr.solve(self.graphs[2], 0.85, 0, max_iterations=5)
+        self.assertEqual(len(history), 5)
+
+# End class
+
+class PersonalizedPagerankTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = pr.crawl_graph('corpus2')
+        N = len(cls.graph)
+        cls.teleport = np.zeros((N, 4))
+        cls.teleport[0, 0] = 1
+        cls.teleport[[1, 2], 1] = 1
+        cls.teleport[:, 2] = 1
+        cls.teleport[[3, 4, 5, 6, 7], 3] = [1, 2, 3, 4, 5]
+
+    def test_uniform_teleport(self):
+        N = len(self.graph)
+        rank = pr.personalized_ranks(self.graph, 0.85, np.ones(N), tolerance=1e-12)
+        expected = pr.power_iteration(self.graph, 0.85, tolerance=1e-12)
+        np.testing.assert_allclose(rank, expected, atol=1e-10)
+
+    def test_matches_linear_solution(self):
+        N = len(self.graph)
+        rank = pr.personalized_ranks(self.graph, 0.85, self.teleport, tolerance=1e-12)
+        for j in range(self.teleport.shape[1]):
+            with self.subTest(column=j):
+                # Pages without links lead to the teleport vector
+                v = self.teleport[:, j] / self.teleport[:, j].sum()
+                P = np.zeros((N, N))
+                for source, target in zip(*self.graph.links()):
+                    P[target, source] = 1 / self.graph.out_degree[source]
+                P[:, self.graph.dangling] = v[:, np.newaxis]
+                expected = np.linalg.solve(np.eye(N) - 0.85 * P, 0.15 * v)
+                np.testing.assert_allclose(rank[:, j], expected, atol=1e-10)
+
+    def test_batch_matches_single(self):
+        rank = pr.personalized_ranks(self.graph, 0.85, self.teleport, tolerance=1e-12)
+        for j in range(self.teleport.shape[1]):
+            with self.subTest(column=j):
+                expected = pr.personalized_ranks(
+                    self.graph, 0.85, self.teleport[:, j], tolerance=1e-12
+                )
+                np.testing.assert_allclose(rank[:, j], expected, atol=1e-10)
+
+    def test_mix_ranks(self):
+        rank = pr.personalized_ranks(self.graph, 0.85, self.teleport, tolerance=1e-12)
+        weights = np.array([[0.5, 0, 1], [0.5, 0, 1], [0, 1, 1], [0, 0, 1]])
+        result = pr.mix_ranks(self.graph, 0.85, rank, weights)
+        teleport = self.teleport / self.teleport.sum(axis=0)
+        expected = pr.personalized_ranks(self.graph, 0.85, teleport @ weights, tolerance=1e-12)
+        np.testing.assert_allclose(result, expected, atol=1e-10)
+
+    def test_topic_pagerank(self):
+        corpus = pr.crawl('corpus2')
+        topics = {'languages': {'c.html', 'python.html'}, 'ai': {'ai.html'}}
+        result = pr.topic_pagerank(corpus, 0.85, topics, tolerance=1e-10)
+        self.assertListEqual(list(result), ['languages', 'ai'])
+        for topic, rank in result.items():
+            with self.subTest(topic=topic):
+                self.assertSetEqual(set(rank), set(corpus))
+                self.assertAlmostEqual(sum(rank.values()), 1)
+                best = max(rank, key=rank.get)
+                self.assertIn(best, topics[topic] | {'programming.html'})
+
+    def test_topic_pagerank_raises_error_if_topic_invalid(self):
+        corpus = pr.crawl('corpus2')
+        with self.assertRaises(ValueError):
+            pr.topic_pagerank(corpus, 0.85, {'ai': {'ai.html'}, 'empty': set()})
+        with self.assertRaises(KeyError):
+            pr.topic_pagerank(corpus, 0.85, {'unknown': {'unknown.html'}})
+
+    def test_zero_teleport_raises_value_error(self):
+        teleport = self.teleport.copy()
+        teleport[:, 1] = 0
+        with self.assertRaises(ValueError):
+            pr.personalized_ranks(self.graph, 0.85, teleport)
+        with self.assertRaises(ValueError):
+            pr.personalized_ranks(self.graph, 0.85, np.zeros(len(self.graph)))
+
+    def test_inbound_sum_matrix_matches_columns(self):
+        values = np.random.default_rng(0).random((len(self.graph), 3))
+        for sparse in [pr.sparse, None]:
+            for rows in [None, np.array([5, 0, 3]), slice(2, 6)]:
+                with self.subTest(sparse=sparse is not None, rows=rows), \
+                        patch.object(pr, 'sparse', sparse):
+                    result = self.graph.inbound_sum(values, rows)
+                    for j in range(values.shape[1]):
+                        expected = self.graph.inbound_sum(values[:, j], rows)
+                        np.testing.assert_allclose(result[:, j], expected, atol=1e-12)
+
+    def test_step_with_rows_and_teleport(self):
+        N = len(self.graph)
+        teleport = self.teleport / self.teleport.sum(axis=0)
+        rank = np.full((N, 4), 1 / N)
+        rows = np.array([6, 1, 4])
+        for j in [slice(None), 3]:
+            with self.subTest(columns=j):
+                expected = self.graph.step(rank[:, j], 0.85, teleport=teleport[:, j])
+                result = self.graph.step(rank[:, j], 0.85, rows=rows, teleport=teleport[:, j])
+                np.testing.assert_allclose(result, expected[rows], atol=1e-12)
+
+# End class
+
+class EdgeListTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = pr.crawl_graph('corpus2')
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'edges.bin')
+
+        # Write the links in shuffled chunks, with buckets of 3 links
+        sources, targets = self.graph.links()
+        order = np.random.default_rng(0).permutation(len(sources))
+        chunks = [(sources[order[:5]], targets[order[:5]]), (sources[order[5:]], targets[order[5:]])]
+        pr.write_edges(self.filename, len(self.graph), chunks, block=3)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_edges_sorted(self):
+        edges = pr.EdgeList(self.filename, block=2)
+        sources, targets = self.graph.links()
+
+        self.assertEqual(len(edges), len(self.graph))
+        self.assertListEqual(
+            np.array(edges.edges).tolist(),
+            sorted([[s, t] for s, t in zip(sources.tolist(), targets.tolist())], key=lambda link: (link[1], link[0]))
+        )
+        self.assertListEqual(edges.out_degree.tolist(), self.graph.out_degree.tolist())
+        self.assertListEqual(edges.dangling.tolist(), self.graph.dangling.tolist())
+        del edges
+
+    def test_matches_graph(self):
+        edges = pr.EdgeList(self.filename, block=2)
+        expected = pr.power_iteration(self.graph, 0.85, tolerance=1e-12)
+        for method in ['power', 'extrapolation']:
+            with self.subTest(method=method):
+                rank, _ = pr.solve(edges, 0.85, 1e-12, method)
+                np.testing.assert_allclose(rank, expected, atol=1e-10)
+        del edges
+
+    def test_unsupported_solver_raises_value_error(self):
+        edges = pr.EdgeList(self.filename)
+        for method in ['gauss-seidel', 'adaptive']:
+            with self.subTest(method=method), self.assertRaises(ValueError):
+                pr.solve(edges, 0.85, 1e-6, method)
+        del edges
+
+    def test_write_edges_few_buckets_at_a_time(self):
+        filename = os.path.join(self.directory.name, 'batched.bin')
+        with patch.object(pr, 'EDGE_BUCKETS_OPEN', 2):
+            pr.write_edges(filename, len(self.graph), [self.graph.links()], block=3)
+        with open(filename, 'rb') as batched, open(self.filename, 'rb') as f:
+            self.assertEqual(batched.read(), f.read())
+
+    def test_not_an_edge_list(self):
+        with open(self.filename, 'wb') as f:
+            f.write(b'<html></html>')
+        with self.assertRaises(ValueError):
+            pr.EdgeList(self.filename)
+
+# End class
+
+class UpdatePagerankTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.graph = pr.crawl_graph('corpus2')
+        cls.rank = pr.power_iteration(cls.graph, 0.85, tolerance=1e-12)
+
+    def test_matches_power_iteration(self):
+        # [add_pages, remove_pages, add_links, remove_links]
+        cases = [
+            [[], [], [("recursion.html", "c.html")], []],
+            [[], [], [], [("ai.html", "inference.html")]],
+            [["java.html"], [], [("java.html", "programming.html")], []],
+            [[], ["logic.html", "python.html"], [], []],
+            [[], ["programming.html"], [("c.html", "new.html")], [("ai.html", "algorithms.html")]],
+        ]
+
+        for case in cases:
+            add_pages, remove_pages, add_links, remove_links = case
+            with self.subTest(case=case):
+                graph, rank, error = pr.update_pagerank(
+                    self.graph, self.rank, 0.85, add_pages, remove_pages,
+                    add_links, remove_links, tolerance=1e-12
+                )
+
+                corpus = pr.crawl('corpus2')
+                for page in remove_pages:
+                    del corpus[page]
+                for page in add_pages:
+                    corpus[page] = set()
+                for links in corpus.values():
+                    links.difference_update(remove_pages)
+                for source, target in add_links:
+                    corpus.setdefault(target, set())
+                    corpus.setdefault(source, set()).add(target)
+                for source, target in remove_links:
+                    corpus[source].discard(target)
+                self.assertDictEqual(graph.to_corpus(), corpus)
+
+                expected = pr.iterate_pagerank(corpus, 0.85, tolerance=1e-12)
+                for i, page in enumerate(graph.pages):
+                    self.assertAlmostEqual(rank[i], expected[page], places=8)
+                self.assertLess(error, 1e-8)
+
+    def test_accepts_generators(self):
+        changes = ([], ["logic.html"], [("c.html", "new.html")], [("ai.html", "algorithms.html")])
+        graph, rank, error = pr.update_pagerank(
+            self.graph, self.rank, 0.85, *changes, tolerance=1e-12
+        )
+        generated = pr.update_pagerank(
+            self.graph, self.rank, 0.85, *(iter(change) for change in changes), tolerance=1e-12
+        )
+
+        self.assertListEqual(generated[0].pages, graph.pages)
+        self.assertDictEqual(generated[0].to_corpus(), graph.to_corpus())
+        self.assertListEqual(generated[1].tolist(), rank.tolist())
+
+    def test_save_and_load_ranks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'ranks.npz')
+            pr.save_ranks(filename, self.graph, self.rank)
+            graph, rank = pr.load_ranks(filename)
+
+        self.assertListEqual(graph.pages, self.graph.pages)
+        self.assertDictEqual(graph.to_corpus(), self.graph.to_corpus())
+        self.assertListEqual(rank.tolist(), self.rank.tolist())
+
 # End class
 
 
@@ -178,12 +532,45 @@ def suite():
     suite.addTest(TransitionModelTestCase('test_one_outgoing_link'))
     suite.addTest(TransitionModelTestCase('test_multiple_outgoing_links'))
 
+    suite.addTest(CrawlTestCase('test_crawl'))
+    suite.addTest(CrawlTestCase('test_crawl_graph'))
+
     suite.addTest(SamplePagerankTestCase('test_function_returns_dictionary'))
     suite.addTest(SamplePagerankTestCase('test_ranks_sum_up_to_one'))
+    suite.addTest(SamplePagerankTestCase('test_seed_is_reproducible'))
+    suite.addTest(SamplePagerankTestCase('test_ranks_close_to_iteration'))
 
     suite.addTest(IteratePagerankTestCase('test_get_page_rank_first_iteration')) 
     suite.addTest(IteratePagerankTestCase('test_function_returns_dictionary'))        
     suite.addTest(IteratePagerankTestCase('test_ranks_sum_up_to_one'))        
+    suite.addTest(IteratePagerankTestCase('test_graph_step_matches_get_page_rank'))
+    suite.addTest(IteratePagerankTestCase('test_converges_to_fixed_point'))
+    suite.addTest(IteratePagerankTestCase('test_change_below_threshold'))
+
+    suite.addTest(SolverTestCase('test_solvers_agree'))
+    suite.addTest(SolverTestCase('test_history'))
+    suite.addTest(SolverTestCase('test_adaptive_freezes_converged_pages'))
+    suite.addTest(SolverTestCase('test_max_iterations'))
+
+    suite.addTest(PersonalizedPagerankTestCase('test_uniform_teleport'))
+    suite.addTest(PersonalizedPagerankTestCase('test_matches_linear_solution'))
+    suite.addTest(PersonalizedPagerankTestCase('test_batch_matches_single'))
+    suite.addTest(PersonalizedPagerankTestCase('test_mix_ranks'))
+    suite.addTest(PersonalizedPagerankTestCase('test_topic_pagerank'))
+    suite.addTest(PersonalizedPagerankTestCase('test_topic_pagerank_raises_error_if_topic_invalid'))
+    suite.addTest(PersonalizedPagerankTestCase('test_zero_teleport_raises_value_error'))
+    suite.addTest(PersonalizedPagerankTestCase('test_inbound_sum_matrix_matches_columns'))
+    suite.addTest(PersonalizedPagerankTestCase('test_step_with_rows_and_teleport'))
+
+    suite.addTest(EdgeListTestCase('test_edges_sorted'))
+    suite.addTest(EdgeListTestCase('test_matches_graph'))
+    suite.addTest(EdgeListTestCase('test_unsupported_solver_raises_value_error'))
+    suite.addTest(EdgeListTestCase('test_write_edges_few_buckets_at_a_time'))
+    suite.addTest(EdgeListTestCase('test_not_an_edge_list'))
+
+    suite.addTest(UpdatePagerankTestCase('test_matches_power_iteration'))
+    suite.addTest(UpdatePagerankTestCase('test_accepts_generators'))
+    suite.addTest(UpdatePagerankTestCase('test_save_and_load_ranks'))
           
         
     return suite
@@ -0,0 +1,161 @@
+import csv
+import functools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import heredity
+
+FORMATS = ["json", "csv"]
+
+# Columns of the CSV output, one row per person
+COLUMNS = ["family", "person", "gene_2", "gene_1", "gene_0", "trait_true", "trait_false", "error"]
+
+
+def main():
+
+    # Check for proper usage
+    methods = list(heredity.METHODS) + list(heredity.SAMPLERS)
+    args, model = heredity.model_option(sys.argv[1:])
+    if (len(args) not in [1, 2, 3]
+            or (len(args) > 1 and args[1] not in FORMATS)
+            or (len(args) > 2 and args[2] not in methods)):
+        sys.exit(
+            "Usage: python batch.py (directory|manifest) "
+            f"[{'|'.join(FORMATS)} [{'|'.join(methods)}]] [--model model.json]"
+        )
+    filenames = family_files(args[0])
+    output = args[1] if len(args) > 1 else "json"
+    method = args[2] if len(args) > 2 else "elimination"
+
+    # Stream results as families finish, in the order of `filenames`
+    start = time.perf_counter()
+    failures = 0
+    writer = csv.writer(sys.stdout) if output == "csv" else None
+    if writer:
+        writer.writerow(COLUMNS)
+    for result in run(filenames, method, model):
+        if result["error"] is not None:
+            failures += 1
+            print(f"{result['family']}: {result['error']}", file=sys.stderr)
+        if writer:
+            writer.writerows(rows(result))
+        else:
+            print(json.dumps(result))
+    elapsed = time.perf_counter() - start
+
+    # Report throughput
+    print(f"Families: {len(filenames)} ({failures} failed)", file=sys.stderr)
+    print(f"Total time: {elapsed:.2f} s", file=sys.stderr)
+    print(f"Families per second: {len(filenames) / elapsed:.1f}", file=sys.stderr)
+
+
+def family_files(path):
+    """
+    Return the family CSV files to run: the `.csv` files in `path` if it
+    is a directory, in sorted order, or else the files listed in the
+    manifest `path`, one per line, relative to the manifest. Blank lines
+    and lines starting with `#` are ignored.
+    """
+    if os.path.isdir(path):
+        return [
+            os.path.join(path, filename)
+            for filename in sorted(os.listdir(path))
+            if filename.endswith(".csv")
+        ]
+    directory = os.path.dirname(path)
+    with open(path) as f:
+        lines = [line.strip() for line in f]
+    return [
+        os.path.join(directory, line)
+        for line in lines
+        if line and not line.startswith("#")
+    ]
+
+
+def run(filenames, method="elimination", model=None, processes=None):
+    """
+    Run `infer` on every family in `filenames` across a process pool.
+    Yield the results in the order of `filenames`, as they become available.
+
+    If a worker process dies, the pool breaks: the first family without a
+    result is then run again in a process of its own, so that it is only
+    reported as failed if it was the one that killed its worker, and the
+    remaining families are run in a new pool.
+    """
+    infer_family = functools.partial(infer, method, model)
+    done = 0
+    while done < len(filenames):
+        rest = filenames[done:]
+        try:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                chunksize = max(1, len(rest) // (4 * (processes or os.cpu_count() or 1)))
+                for result in executor.map(infer_family, rest, chunksize=chunksize):
+                    done += 1
+                    yield result
+        except BrokenProcessPool:
+            yield infer_alone(infer_family, filenames[done])
+            done += 1
+
+
+def infer_alone(infer_family, filename):
+    """
+    Return the result of `infer_family(filename)`, computed in a process of
+    its own, or a failed result if that process dies.
+    """
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        try:
+            return executor.submit(infer_family, filename).result()
+        except BrokenProcessPool:
+            return {
+                "family": filename, "probabilities": None, "errors": None,
+                "error": "BrokenProcessPool: worker process died"
+            }
+
+
+def infer(method, model, filename):
+    """
+    Load the family in `filename` and compute the gene and trait
+    probabilities of each person with `method`, one of `heredity.METHODS`
+    or `heredity.SAMPLERS` (seeded with 0), and the `heredity.Model`
+    `model` (or the default one if None).
+
+    Return a dictionary with the "family" filename, the "probabilities"
+    and, for sampling methods, the standard "errors" of each person, and
+    the "error" message if the family failed, so that one bad family does
+    not stop the others.
+    """
+    result = {"family": filename, "probabilities": None, "errors": None, "error": None}
+    try:
+        people = heredity.load_data(filename)
+        if method in heredity.SAMPLERS:
+            result["probabilities"], result["errors"] = heredity.SAMPLERS[method](people, seed=0, model=model)
+        else:
+            result["probabilities"] = heredity.METHODS[method](people, model=model)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def rows(result):
+    """
+    Return the CSV rows of an `infer` result: one per person, or a single
+    row with the error if the family failed.
+    """
+    if result["error"] is not None:
+        return [[result["family"], "", "", "", "", "", "", result["error"]]]
+    return [
+        [
+            result["family"], person,
+            probabilities["gene"][2], probabilities["gene"][1], probabilities["gene"][0],
+            probabilities["trait"][True], probabilities["trait"][False], ""
+        ]
+        for person, probabilities in result["probabilities"].items()
+    ]
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
+import copy
 import csv
+import heapq
 import itertools
+import json
 import sys
+
+import numpy as np
 from numpy import prod
 
 PROBS = {
@@ -37,16 +42,58 @@ PROBS = {
     "mutation": 0.01
 }
 
+# Number of assignments of genes and traits to evaluate at once
+ASSIGNMENT_BATCH = 1 << 16
+
+# Number of samples drawn by the sampling methods, and how many to draw at once
+SAMPLES = 100000
+SAMPLE_BATCH = 10000
+
+# Number of Gibbs sampling chains, and number of sweeps discarded by each
+CHAINS = 100
+GIBBS_BURN_IN = 100
+
 
 def main():
 
     # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    methods = list(METHODS) + list(SAMPLERS)
+    args, model = model_option(sys.argv[1:])
+    if len(args) not in [1, 2, 3] or (len(args) > 1 and args[1] not in methods):
+        sys.exit(
+            f"Usage: python heredity.py data.csv [{'|'.join(methods)} [seed]] "
+            "[--model model.json]"
+        )
+    people = load_data(args[0])
+    method = args[1] if len(args) > 1 else "elimination"
+    seed = int(args[2]) if len(args) == 3 else None
 
-    # Keep track of gene and trait probabilities for each person
-    probabilities = {
+    # Compute gene and trait probabilities for each person, and the
+    # standard errors of the estimates of the sampling methods
+    if method in SAMPLERS:
+        probabilities, errors = SAMPLERS[method](people, seed=seed, model=model)
+    else:
+        probabilities, errors = METHODS[method](people, model=model), None
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if errors is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    print(f"    {value}: {p:.4f} ± {errors[person][field][value]:.4f}")
+
+
+def empty_probabilities(people):
+    """
+    Return a dictionary to keep track of gene and trait probabilities
+    for each person, with all probabilities set to 0.
+    """
+    return {
         person: {
             "gene": {
                 2: 0,
@@ -61,38 +108,693 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
 
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
+def enumerate_probabilities(people, model=None):
+    """
+    Compute the gene and trait probabilities of each person by summing
+    the joint probability of every assignment of genes and traits, with
+    the probabilities of `model` (by default, a `Model` of `PROBS`).
+    """
+    # Keep track of gene and trait probabilities for each person
+    probabilities = empty_probabilities(people)
+
+    # Loop over all assignments consistent with known information
+    for one_gene, two_genes, have_trait, p in assignments(people, model):
+        update(probabilities, one_gene, two_genes, have_trait, p)
+
+    # Ensure probabilities sum to 1
+    normalize(probabilities)
+    return probabilities
+
+
+def assignments(people, model=None):
+    """
+    Generate the assignments of genes and traits to `people` that agree
+    with the known traits and have a non-zero probability, as tuples
+    (one_gene, two_genes, have_trait, p) where `p` is the joint probability
+    (see `joint_probability`).
+
+    People are assigned one at a time, parents before their children, so
+    that the probability of each person is known when they are assigned,
+    and branches with a probability of 0 are skipped. Only the current
+    assignment is kept in memory: the same sets are updated between
+    assignments, so they should be copied to be kept.
+    """
+    model = default_model() if model is None else model
+    order = parents_first(people)
+    one_gene = set()
+    two_genes = set()
+    have_trait = set()
+    genes = dict()
+
+    def assign(i, p):
+        if i == len(order):
+            yield one_gene, two_genes, have_trait, p
+            return
+
+        person = people[order[i]]
+        name = person["name"]
+        if has_parents(person):
+            probs_gene = model.inherited[genes[person["mother"]]][genes[person["father"]]]
+        else:
+            probs_gene = model.founder
+        traits = [True, False] if person["trait"] is None else [person["trait"]]
+
+        for gene, group in [(0, None), (1, one_gene), (2, two_genes)]:
+            genes[name] = gene
+            if group is not None:
+                group.add(name)
+            for trait in traits:
+                q = p * probs_gene[gene] * model.traits[gene][trait]
+                if q == 0:
+                    continue
+                if trait:
+                    have_trait.add(name)
+                yield from assign(i + 1, q)
+                have_trait.discard(name)
+            if group is not None:
+                group.discard(name)
+
+    return assign(0, 1.0)
+
+
+def parents_first(people):
+    """
+    Return the names of `people` in an order where parents come before
+    their children.
+    """
+    order = []
+    visited = set()
+
+    def visit(name):
+        if name in visited:
+            return
+        visited.add(name)
+        if has_parents(people[name]):
+            visit(people[name]["mother"])
+            visit(people[name]["father"])
+        order.append(name)
+
+    for name in people:
+        visit(name)
+    return order
+
+
+def vectorized_probabilities(people, model=None):
+    """
+    Compute the gene and trait probabilities of each person like
+    `enumerate_probabilities`, summing the joint probability of every
+    assignment of genes and traits consistent with the known traits,
+    but `ASSIGNMENT_BATCH` assignments at a time with NumPy.
+
+    Assignment k gives person i (in the order of `people`) the gene
+    digit i of k in base 3, and the unknown traits are the bits of
+    k // 3 ** n, where n is the number of people.
+    """
+    names = list(people)
+    n = len(names)
+    unknown = [i for i, name in enumerate(names) if people[name]["trait"] is None]
+    known = np.array([bool(people[name]["trait"]) for name in names])
+    tables = probability_tables(people, model)
+
+    genes_total = np.zeros((n, 3))
+    traits_total = np.zeros((n, 2))
+    powers = 3 ** np.arange(n, dtype=np.int64)
+    assignments = 3 ** n * 2 ** len(unknown)
+    for start in range(0, assignments, ASSIGNMENT_BATCH):
+        k = np.arange(start, min(start + ASSIGNMENT_BATCH, assignments), dtype=np.int64)
+
+        # Decode the assignments into integer arrays, one column per person
+        genes = k[:, np.newaxis] // powers % 3
+        traits = np.broadcast_to(known, genes.shape).copy()
+        bits = k // 3 ** n
+        for j, i in enumerate(unknown):
+            traits[:, i] = (bits >> j) & 1
+
+        p = joint_probabilities(tables, genes, traits)
+        for i in range(n):
+            genes_total[i] += np.bincount(genes[:, i], weights=p, minlength=3)
+            traits_total[i] += np.bincount(traits[:, i], weights=p, minlength=2)
+
+    probabilities = empty_probabilities(people)
+    for i, name in enumerate(names):
+        probabilities[name]["gene"].update(enumerate(genes_total[i].tolist()))
+        probabilities[name]["trait"].update({
+            True: traits_total[i, 1], False: traits_total[i, 0]
+        })
+    normalize(probabilities)
+    return probabilities
+
+
+def probability_tables(people, model=None):
+    """
+    Return the tables used by `joint_probabilities` for `people`, as a
+    dictionary with
+        * "gene", "inheritance" and "trait", the tables of `model` (by
+          default, a `Model` of `PROBS`),
+        * "founders" and "children", the positions of people without and
+          with parents in `people`,
+        * "mothers" and "fathers", the positions of the parents of children.
+    """
+    model = default_model() if model is None else model
+    names = list(people)
+    index = {name: i for i, name in enumerate(names)}
+    children = [i for i, name in enumerate(names) if has_parents(people[name])]
+    return {
+        "gene": model.gene,
+        "inheritance": model.inheritance,
+        "trait": model.trait,
+        "founders": np.array(
+            [i for i in range(len(names)) if i not in set(children)], dtype=np.int64
+        ),
+        "children": np.array(children, dtype=np.int64),
+        "mothers": np.array(
+            [index[people[names[i]]["mother"]] for i in children], dtype=np.int64
+        ),
+        "fathers": np.array(
+            [index[people[names[i]]["father"]] for i in children], dtype=np.int64
+        ),
+    }
+
+
+def joint_probabilities(tables, genes, traits):
+    """
+    Return the joint probability of a batch of assignments, like
+    `joint_probability`: `genes` and `traits` are integer arrays with
+    one row per assignment and one column per person, holding the number
+    of copies of the gene and whether the person has the trait.
+    `tables` are the `probability_tables` of the people.
+    """
+    founders = tables["founders"]
+    children = tables["children"]
+    probs = tables["trait"][genes, traits.astype(np.int64)]
+    probs[:, founders] *= tables["gene"][genes[:, founders]]
+    probs[:, children] *= tables["inheritance"][
+        genes[:, children], genes[:, tables["mothers"]], genes[:, tables["fathers"]]
+    ]
+    return probs.prod(axis=1)
+
+
+def eliminate_probabilities(people, model=None):
+    """
+    Compute the gene and trait probabilities of each person by exact
+    inference in the Bayesian network of the family.
+
+    Every person has a gene variable (0, 1 or 2 copies), depending on the
+    gene variables of their parents. Known traits only weigh the gene
+    variable of their person, and unknown traits are summed out, so the
+    network is reduced to one factor per person over the gene variables
+    of the person and their parents.
+
+    Variables are eliminated in a greedy order (fewest neighbours first),
+    which builds a clique tree; messages are then passed up and down the
+    tree, so that every clique knows the distribution of its variables.
+    For pedigrees shaped like trees, cliques have at most a few variables,
+    and the time is linear in the number of people.
+
+    Probabilities come from `model`, by default a `Model` of `PROBS`.
+    """
+    model = default_model() if model is None else model
+    inheritance = model.inheritance
+    gene = model.gene
+    trait = model.trait[:, 1]
+
+    # One factor per person: (variables, table with one axis per variable)
+    factors = []
+    for person in people.values():
+        name = person["name"]
+        if person["trait"] is None:
+            evidence = np.ones(3)
+        else:
+            evidence = trait if person["trait"] else 1 - trait
+        if has_parents(person):
+            factors.append((
+                (name, person["mother"], person["father"]),
+                inheritance * evidence[:, np.newaxis, np.newaxis]
+            ))
+        else:
+            factors.append(((name,), gene * evidence))
+
+    # Variable elimination, keeping track of the cliques it creates
+    cliques = eliminate(list(people), factors)
+
+    # Pass messages up the clique tree (children come before their parent).
+    # Messages are scaled to sum to 1, so that they do not underflow.
+    up = dict()
+    for i, clique in enumerate(cliques):
+        if clique["parent"] is not None:
+            incoming = [up[child] for child in clique["children"]]
+            up[i] = normalize_factor(
+                multiply([clique["potential"]] + incoming, clique["separator"])
+            )
+
+    # Pass messages down the tree, and read the distribution of the gene
+    # variable eliminated in every clique
+    probabilities = empty_probabilities(people)
+    down = dict()
+    for i in reversed(range(len(cliques))):
+        clique = cliques[i]
+        factors = [clique["potential"]] + ([down[i]] if i in down else [])
+        for child in clique["children"]:
+            others = [up[other] for other in clique["children"] if other != child]
+            down[child] = normalize_factor(
+                multiply(factors + others, cliques[child]["separator"])
+            )
+
+        name = clique["variable"]
+        incoming = [up[child] for child in clique["children"]]
+        _, table = multiply(factors + incoming, (name,))
+        table = table / table.sum()
+        probabilities[name]["gene"].update(enumerate(table.tolist()))
+
+        observed = people[name]["trait"]
+        if observed is None:
+            p = float(table @ trait)
+        else:
+            p = 1.0 if observed else 0.0
+        probabilities[name]["trait"].update({True: p, False: 1 - p})
+
+    return probabilities
+
+
+def eliminate(variables, factors):
+    """
+    Eliminate all `variables` from the product of `factors`, each a tuple
+    (variables, table), choosing at each step a variable with the fewest
+    neighbours.
+
+    Return the list of cliques in elimination order, each a dictionary with
+    the eliminated "variable", the "potential" (product of the factors
+    first used by the clique), the "separator" (variables of the message
+    to the parent clique), and the "parent" and "children" cliques.
+    """
+    factors_of = {variable: set() for variable in variables}
+    for i, (scope, _) in enumerate(factors):
+        for variable in scope:
+            factors_of[variable].add(i)
+    neighbors = {variable: set() for variable in variables}
+    for scope, _ in factors:
+        for variable in scope:
+            neighbors[variable].update(scope)
+    for variable in variables:
+        neighbors[variable].discard(variable)
+
+    # Messages are factors too: remember which clique sent them
+    sender = dict()
+    cliques = []
+    heap = [(len(neighbors[variable]), variable) for variable in variables]
+    heapq.heapify(heap)
+    eliminated = set()
+    while heap:
+        degree, variable = heapq.heappop(heap)
+        if variable in eliminated or degree != len(neighbors[variable]):
             continue
+        eliminated.add(variable)
+
+        used = factors_of[variable]
+        i = len(cliques)
+        children = []
+        originals = []
+        for k in used:
+            if k in sender:
+                children.append(sender[k])
+                cliques[sender[k]]["parent"] = i
+            else:
+                originals.append(factors[k])
+        scope = (variable,) + tuple(sorted(neighbors[variable]))
+        potential = multiply(originals, scope)
+        separator = scope[1:]
+
+        # The message replaces the used factors
+        k = len(factors)
+        factors.append((separator, None))
+        sender[k] = i
+        for other in separator:
+            factors_of[other] -= used
+            factors_of[other].add(k)
+            neighbors[other].discard(variable)
+            neighbors[other].update(n for n in separator if n != other)
+            heapq.heappush(heap, (len(neighbors[other]), other))
+
+        cliques.append({
+            "variable": variable,
+            "potential": potential,
+            "separator": separator,
+            "parent": None,
+            "children": children,
+        })
+
+    return cliques
+
+
+def multiply(factors, scope):
+    """
+    Return the product of `factors`, each a tuple (variables, table),
+    summed over every variable not in `scope`, as a factor over `scope`.
+    """
+    labels = {variable: i for i, variable in enumerate(scope)}
+    operands = []
+    for variables, table in factors:
+        for variable in variables:
+            labels.setdefault(variable, len(labels))
+        operands += [table, [labels[variable] for variable in variables]]
+
+    # Variables of the scope in no factor do not change the product
+    present = {variable for variables, _ in factors for variable in variables}
+    output = [variable for variable in scope if variable in present]
+    table = np.einsum(*operands, [labels[variable] for variable in output]) if operands else np.ones(())
+    shape = [3 if variable in present else 1 for variable in scope]
+    return scope, np.broadcast_to(table.reshape(shape), (3,) * len(scope))
+
+
+def normalize_factor(factor):
+    """
+    Return `factor` scaled so that its table sums to 1.
+    """
+    scope, table = factor
+    return scope, table / table.sum()
 
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
 
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+def likelihood_weighting(people, n=SAMPLES, seed=None, model=None):
+    """
+    Estimate the gene and trait probabilities of each person from `n`
+    samples of the Bayesian network of the family, drawn `SAMPLE_BATCH`
+    at a time with a NumPy generator seeded with `seed`.
+
+    Genes are sampled parents first, from `model` (by default, a `Model`
+    of `PROBS`); known traits are not
+    sampled but weigh the sample by their probability given the gene.
+    Unknown traits are accounted for by their probability given the
+    sampled gene, rather than by a sampled value.
+
+    Return a tuple (probabilities, errors) of dictionaries shaped like
+    `empty_probabilities`, where `errors` holds the standard error of
+    every estimate, computed from the effective number of samples. With
+    many known traits, a few samples get nearly all the weight, and both
+    the estimates and their errors become unreliable: `gibbs_sampling`
+    suits large families better.
+    """
+    rng = np.random.default_rng(seed)
+    names = list(people)
+    tables = probability_tables(people, model)
+    evidence = evidence_table(people, tables)
+
+    genes_total = np.zeros((len(names), 3))
+    traits_total = np.zeros(len(names))
+    weights_total = 0.0
+    squares_total = 0.0
+    scale = -np.inf
+    for start in range(0, n, SAMPLE_BATCH):
+        genes = sample_genes(people, tables, rng, min(SAMPLE_BATCH, n - start))
+        log_weights = np.log(evidence[np.arange(len(names)), genes]).sum(axis=1)
+
+        # Keep weights relative to the largest one so far, so that large
+        # families with many known traits do not underflow
+        if log_weights.max() > scale:
+            rescale = np.exp(scale - log_weights.max())
+            genes_total *= rescale
+            traits_total *= rescale
+            weights_total *= rescale
+            squares_total *= rescale ** 2
+            scale = log_weights.max()
+        weights = np.exp(log_weights - scale)
+
+        for i in range(len(names)):
+            genes_total[i] += np.bincount(genes[:, i], weights=weights, minlength=3)
+        traits_total += weights @ tables["trait"][genes, 1]
+        weights_total += weights.sum()
+        squares_total += weights @ weights
+
+    effective = weights_total ** 2 / squares_total
+    genes_p = genes_total / weights_total
+    traits_p = traits_total / weights_total
+    return sampled_probabilities(
+        people,
+        genes_p, np.sqrt(genes_p * (1 - genes_p) / effective),
+        traits_p, np.sqrt(traits_p * (1 - traits_p) / effective)
+    )
+
 
-    # Ensure probabilities sum to 1
+def gibbs_sampling(people, n=SAMPLES, seed=None, chains=CHAINS, model=None):
+    """
+    Estimate the gene and trait probabilities of each person with `chains`
+    Gibbs samplers run side by side with NumPy, for about `n` samples in
+    total after `GIBBS_BURN_IN` sweeps, with a generator seeded with `seed`
+    and the probabilities of `model` (by default, a `Model` of `PROBS`).
+
+    Unknown traits are summed out, so every sweep resamples the gene of
+    each person from its distribution given the genes of their parents,
+    their children and the children's other parents, and their known
+    trait. Estimates average these distributions rather than the sampled
+    genes, which lowers their variance.
+
+    Return a tuple (probabilities, errors) like `likelihood_weighting`,
+    where errors are computed from the spread of the estimates of the
+    independent chains.
+    """
+    rng = np.random.default_rng(seed)
+    names = list(people)
+    index = {name: i for i, name in enumerate(names)}
+    tables = probability_tables(people, model)
+    evidence = evidence_table(people, tables)
+    inheritance = tables["inheritance"]
+    order = [index[name] for name in parents_first(people)]
+    mothers, fathers = parent_positions(tables, len(names))
+    children = [[] for _ in names]
+    for child, mother, father in zip(tables["children"], tables["mothers"], tables["fathers"]):
+        children[mother].append(child)
+        if father != mother:
+            children[father].append(child)
+
+    genes = sample_genes(people, tables, rng, chains)
+    sweeps = max(1, n // chains)
+    genes_total = np.zeros((chains, len(names), 3))
+    values = np.arange(3)[np.newaxis, :]
+    for sweep in range(GIBBS_BURN_IN + sweeps):
+        for i in order:
+            if mothers[i] < 0:
+                p = np.broadcast_to(tables["gene"], (chains, 3))
+            else:
+                p = inheritance[:, genes[:, mothers[i]], genes[:, fathers[i]]].T
+            p = p * evidence[i]
+            for child in children[i]:
+                gene = genes[:, child, np.newaxis]
+                mother = values if mothers[child] == i else genes[:, mothers[child], np.newaxis]
+                father = values if fathers[child] == i else genes[:, fathers[child], np.newaxis]
+                p = p * inheritance[gene, mother, father]
+            p = p / p.sum(axis=1, keepdims=True)
+            genes[:, i] = draw(p, rng)
+            if sweep >= GIBBS_BURN_IN:
+                genes_total[:, i] += p
+
+    # Estimates of every chain, then their mean and its standard error
+    genes_p = genes_total / sweeps
+    traits_p = genes_p @ tables["trait"][:, 1]
+    return sampled_probabilities(
+        people,
+        genes_p.mean(axis=0), genes_p.std(axis=0, ddof=1) / np.sqrt(chains),
+        traits_p.mean(axis=0), traits_p.std(axis=0, ddof=1) / np.sqrt(chains)
+    )
+
+
+def evidence_table(people, tables):
+    """
+    Return the probability of the known trait of every person (rows) for
+    every number of copies of the gene (columns), or 1 if it is unknown.
+    """
+    evidence = np.ones((len(people), 3))
+    for i, person in enumerate(people.values()):
+        if person["trait"] is not None:
+            evidence[i] = tables["trait"][:, int(bool(person["trait"]))]
+    return evidence
+
+
+def parent_positions(tables, n):
+    """
+    Return arrays of the positions of the mother and father of each of
+    `n` people, or -1 for people without parents.
+    """
+    mothers = np.full(n, -1, dtype=np.int64)
+    fathers = np.full(n, -1, dtype=np.int64)
+    mothers[tables["children"]] = tables["mothers"]
+    fathers[tables["children"]] = tables["fathers"]
+    return mothers, fathers
+
+
+def sample_genes(people, tables, rng, size):
+    """
+    Return `size` samples of the genes of `people` from their
+    `probability_tables`, ignoring traits, as an integer array with one
+    column per person.
+    """
+    index = {name: i for i, name in enumerate(people)}
+    mothers, fathers = parent_positions(tables, len(people))
+    genes = np.empty((size, len(people)), dtype=np.int64)
+    for name in parents_first(people):
+        i = index[name]
+        if mothers[i] < 0:
+            p = np.broadcast_to(tables["gene"], (size, 3))
+        else:
+            p = tables["inheritance"][:, genes[:, mothers[i]], genes[:, fathers[i]]].T
+        genes[:, i] = draw(p, rng)
+    return genes
+
+
+def draw(p, rng):
+    """
+    Return one number of copies of the gene drawn from every row of `p`.
+    """
+    u = rng.random(len(p))[:, np.newaxis]
+    return (u >= np.cumsum(p, axis=1)[:, :2]).sum(axis=1)
+
+
+def sampled_probabilities(people, genes, genes_error, traits, traits_error):
+    """
+    Return a tuple (probabilities, errors) of dictionaries shaped like
+    `empty_probabilities`, from arrays of estimates of the gene (one row
+    per person) and trait probabilities of `people` and their errors.
+    Known traits are certain.
+    """
+    probabilities = empty_probabilities(people)
+    errors = empty_probabilities(people)
+    for i, (name, person) in enumerate(people.items()):
+        probabilities[name]["gene"].update(enumerate(genes[i].tolist()))
+        errors[name]["gene"].update(enumerate(genes_error[i].tolist()))
+        if person["trait"] is None:
+            p, error = float(traits[i]), float(traits_error[i])
+        else:
+            p, error = (1.0 if person["trait"] else 0.0), 0.0
+        probabilities[name]["trait"].update({True: p, False: 1 - p})
+        errors[name]["trait"].update({True: error, False: error})
     normalize(probabilities)
+    return probabilities, errors
 
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+
+class Model():
+    """
+    Probabilities of a genetic model, precomputed at full precision for
+    every inference method, from a dictionary shaped like `PROBS`.
+    """
+
+    def __init__(self, probs=None, mutation=None):
+        """
+        Precompute the tables of `probs` (by default, `PROBS`), with its
+        mutation probability replaced by `mutation` if given.
+        Raise ValueError if a distribution does not sum to 1.
+        """
+        probs = PROBS if probs is None else probs
+        self.mutation = probs["mutation"] if mutation is None else mutation
+        if not 0 <= self.mutation <= 1:
+            raise ValueError(f"mutation probability {self.mutation} not in [0, 1]")
+
+        # Probability of every number of copies of the gene, for founders
+        self.gene = np.array([probs["gene"][g] for g in range(3)], dtype=float)
+
+        # Probability of not having and having the trait (columns) for
+        # every number of copies of the gene (rows)
+        self.trait = np.array([
+            [probs["trait"][g][False], probs["trait"][g][True]] for g in range(3)
+        ], dtype=float)
+
+        # Probability of the number of copies of a child, indexed by the
+        # number of copies of the child, mother and father
+        self.inheritance = inheritance_table(self.mutation)
+
+        for name, table in [("gene", self.gene), ("trait", self.trait)]:
+            if not np.allclose(table.sum(axis=-1), 1) or (table < 0).any():
+                raise ValueError(f"{name} probabilities do not sum to 1")
+
+        # The same tables as lists, for methods working with Python numbers:
+        # founder[gene], traits[gene][trait] and inherited[mother][father][gene]
+        self.founder = self.gene.tolist()
+        self.traits = [dict(zip([False, True], row)) for row in self.trait.tolist()]
+        self.inherited = self.inheritance.transpose(1, 2, 0).tolist()
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load a model from a JSON file shaped like `PROBS`, with keys
+        "gene", "trait" and "mutation". Missing keys keep their value in
+        `PROBS`. Numbers of copies are written as strings ("0", "1", "2")
+        and traits as "true" and "false"; other trait keys raise ValueError.
+        """
+        with open(filename) as f:
+            data = json.load(f)
+        probs = dict(PROBS)
+        if "gene" in data:
+            probs["gene"] = {int(g): p for g, p in data["gene"].items()}
+        if "trait" in data:
+            traits = {"true": True, "false": False}
+            for ps in data["trait"].values():
+                for trait in ps:
+                    if trait not in traits:
+                        raise ValueError(f'trait {trait!r} is not "true" or "false"')
+            probs["trait"] = {
+                int(g): {traits[trait]: p for trait, p in ps.items()}
+                for g, ps in data["trait"].items()
+            }
+        if "mutation" in data:
+            probs["mutation"] = data["mutation"]
+        return cls(probs)
+
+
+# The Model of PROBS, and the copy of PROBS it was built from
+DEFAULT_MODEL = None
+DEFAULT_PROBS = None
+
+
+def default_model():
+    """
+    Return the `Model` of `PROBS`. It is built on the first call, and
+    only built again if `PROBS` has changed since.
+    """
+    global DEFAULT_MODEL, DEFAULT_PROBS
+    if DEFAULT_MODEL is None or PROBS != DEFAULT_PROBS:
+        DEFAULT_MODEL = Model()
+        DEFAULT_PROBS = copy.deepcopy(PROBS)
+    return DEFAULT_MODEL
+
+
+def model_option(args):
+    """
+    Remove a "--model filename" option from the command-line arguments
+    `args`, and return a tuple (args, model) with the remaining arguments
+    and the `Model` loaded from the file, or None if there is no option.
+    """
+    if "--model" not in args:
+        return args, None
+    i = args.index("--model")
+    if i + 1 == len(args):
+        sys.exit("--model requires a file name")
+    return args[:i] + args[i + 2:], Model.load(args[i + 1])
+
+
+def inheritance_table(mutation):
+    """
+    Return the table of probabilities that a child has 0, 1 or 2 copies of
+    the gene, indexed by the number of copies of the child, mother and father.
+    """
+    # Probability of passing the gene on, by number of copies of a parent
+    passing = np.array([mutation, 0.5, 1 - mutation])
+    mother = passing[np.newaxis, :, np.newaxis]
+    father = passing[np.newaxis, np.newaxis, :]
+    return np.concatenate([
+        (1 - mother) * (1 - father),
+        mother * (1 - father) + (1 - mother) * father,
+        mother * father
+    ])
+
+
+METHODS = {
+    "elimination": eliminate_probabilities,
+    "enumeration": enumerate_probabilities,
+    "vectorized": vectorized_probabilities,
+}
+
+SAMPLERS = {
+    "likelihood": likelihood_weighting,
+    "gibbs": gibbs_sampling,
+}
 
 
 def load_data(filename):
@@ -119,17 +821,16 @@ def load_data(filename):
 
 def powerset(s):
     """
-    Return a list of all possible subsets of set s.
+    Generate all possible subsets of set s, one at a time.
     """
     s = list(s)
-    return [
-        set(s) for s in itertools.chain.from_iterable(
-            itertools.combinations(s, r) for r in range(len(s) + 1)
-        )
-    ]
+    for subset in itertools.chain.from_iterable(
+        itertools.combinations(s, r) for r in range(len(s) + 1)
+    ):
+        yield set(subset)
 
 
-def joint_probability(people, one_gene, two_genes, have_trait):
+def joint_probability(people, one_gene, two_genes, have_trait, model=None):
     """
     Compute and return a joint probability.
 
@@ -139,21 +840,23 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone not in `one_gene` or `two_gene` does not have the gene, and
         * everyone in set `have_trait` has the trait, and
         * everyone not in set `have_trait` does not have the trait.
+
+    Probabilities come from `model`, by default a `Model` of `PROBS`.
     """
+    model = default_model() if model is None else model
     probs = [] # list to gather values to multiply
     for person_name in people:
         gene = get_nr_genes(person_name, one_gene, two_genes)
         trait = person_name in have_trait 
-        prob_trait = PROBS["trait"][gene][trait]
+        prob_trait = model.traits[gene][trait]
         if not has_parents(people[person_name]):
             # person has no parents
-            prob_gene = PROBS["gene"][gene]
+            prob_gene = model.founder[gene]
         else:
             # person has parents
             father_nr_genes = get_nr_genes(people[person_name]["father"], one_gene, two_genes)
             mother_nr_genes = get_nr_genes(people[person_name]["mother"], one_gene, two_genes)
-            probs_inherited_nr_genes = get_probs_inherited_nr_genes(father_nr_genes, mother_nr_genes, PROBS["mutation"])
-            prob_gene = probs_inherited_nr_genes[gene]
+            prob_gene = model.inherited[mother_nr_genes][father_nr_genes][gene]
         probs.append(prob_gene * prob_trait)
 
     # calculate and return product
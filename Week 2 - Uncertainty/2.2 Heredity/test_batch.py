@@ -0,0 +1,126 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import batch
+import heredity as h
+
+
+def load_or_crash(filename):
+    """Kill the worker process on files named crash.csv."""
+    if os.path.basename(filename) == 'crash.csv':
+        os._exit(1)
+    return LOAD_DATA(filename)
+
+
+LOAD_DATA = h.load_data
+
+
+class BatchTestCase(unittest.TestCase):
+
+    def test_family_files_in_directory(self):
+        self.assertListEqual(
+            batch.family_files('data'),
+            [os.path.join('data', f'family{i}.csv') for i in range(3)]
+        )
+
+    def test_family_files_in_manifest(self):
+        with tempfile.TemporaryDirectory() as directory:
+            manifest = os.path.join(directory, 'families.txt')
+            with open(manifest, 'w') as f:
+                f.write('# families\nfamily1.csv\n\n  family0.csv  \n')
+            self.assertListEqual(
+                batch.family_files(manifest),
+                [os.path.join(directory, 'family1.csv'), os.path.join(directory, 'family0.csv')]
+            )
+
+    def test_infer(self):
+        result = batch.infer('elimination', None, 'data/family0.csv')
+        self.assertIsNone(result['error'])
+        self.assertIsNone(result['errors'])
+        self.assertSetEqual(set(result['probabilities']), {'Harry', 'James', 'Lily'})
+
+        result = batch.infer('gibbs', None, 'data/family0.csv')
+        self.assertIsNone(result['error'])
+        self.assertSetEqual(set(result['errors']), {'Harry', 'James', 'Lily'})
+
+    def test_infer_isolates_errors(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'family.csv')
+            with open(filename, 'w') as f:
+                f.write('name,mother,father,trait\nHarry,Lily,James,\n')
+            result = batch.infer('elimination', None, filename)
+        self.assertEqual(result['family'], filename)
+        self.assertIsNone(result['probabilities'])
+        self.assertTrue(result['error'].startswith('KeyError'))
+
+        result = batch.infer('elimination', None, 'data/missing.csv')
+        self.assertTrue(result['error'].startswith('FileNotFoundError'))
+
+    def test_rows(self):
+        result = batch.infer('elimination', None, 'data/family0.csv')
+        rows = batch.rows(result)
+        self.assertEqual(len(rows), 3)
+        for row in rows:
+            self.assertEqual(len(row), len(batch.COLUMNS))
+            self.assertEqual(row[0], 'data/family0.csv')
+            self.assertAlmostEqual(row[2] + row[3] + row[4], 1)
+            self.assertAlmostEqual(row[5] + row[6], 1)
+            self.assertEqual(row[7], '')
+        harry = next(row for row in rows if row[1] == 'Harry')
+        probabilities = result['probabilities']['Harry']
+        self.assertListEqual(harry[2:7], [
+            probabilities['gene'][2], probabilities['gene'][1], probabilities['gene'][0],
+            probabilities['trait'][True], probabilities['trait'][False]
+        ])
+
+    def test_rows_of_failed_family(self):
+        result = batch.infer('elimination', None, 'data/missing.csv')
+        self.assertListEqual(
+            batch.rows(result),
+            [['data/missing.csv', '', '', '', '', '', '', result['error']]]
+        )
+
+    def test_run(self):
+        filenames = [os.path.join('data', f'family{i}.csv') for i in [2, 0, 1]]
+        results = list(batch.run(filenames, processes=2))
+        self.assertListEqual([result['family'] for result in results], filenames)
+        for filename, result in zip(filenames, results):
+            self.assertIsNone(result['error'])
+            self.assertEqual(result['probabilities'], h.eliminate_probabilities(h.load_data(filename)))
+
+    def test_run_survives_worker_crash(self):
+        # Worker processes are forked, and inherit the patched function
+        filenames = ['data/family0.csv', 'crash.csv', 'data/family1.csv', 'data/family2.csv']
+        with patch.object(h, 'load_data', load_or_crash):
+            results = list(batch.run(filenames, processes=2))
+        self.assertListEqual([result['family'] for result in results], filenames)
+        self.assertIn('BrokenProcessPool', results[1]['error'])
+        for result in results[:1] + results[2:]:
+            self.assertIsNone(result['error'])
+            self.assertIsNotNone(result['probabilities'])
+
+# End class
+
+
+def suite():
+    suite = unittest.TestSuite()
+
+    suite.addTest(BatchTestCase('test_family_files_in_directory'))
+    suite.addTest(BatchTestCase('test_family_files_in_manifest'))
+
+    suite.addTest(BatchTestCase('test_infer'))
+    suite.addTest(BatchTestCase('test_infer_isolates_errors'))
+
+    suite.addTest(BatchTestCase('test_rows'))
+    suite.addTest(BatchTestCase('test_rows_of_failed_family'))
+
+    suite.addTest(BatchTestCase('test_run'))
+    suite.addTest(BatchTestCase('test_run_survives_worker_crash'))
+
+    return suite
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite())
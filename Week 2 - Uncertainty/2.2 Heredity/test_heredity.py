@@ -1,5 +1,12 @@
+import json
+import os
+import tempfile
+import types
 import unittest
 from copy import deepcopy
+from unittest import mock
+
+import numpy as np
 
 import heredity as h
 
@@ -105,6 +112,261 @@ class JointProbabilityTestCase(unittest.TestCase):
 
 # End class
 
+class AssignmentsTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.people = h.load_data('data/family1.csv')
+
+    def test_powerset_is_lazy(self):
+        subsets = h.powerset({'a', 'b', 'c'})
+        self.assertIsInstance(subsets, types.GeneratorType)
+        self.assertEqual(len(list(subsets)), 8)
+
+    def test_parents_first(self):
+        order = h.parents_first(self.people)
+        self.assertSetEqual(set(order), set(self.people))
+        for name in order:
+            person = self.people[name]
+            if h.has_parents(person):
+                with self.subTest(name=name):
+                    self.assertLess(order.index(person['mother']), order.index(name))
+                    self.assertLess(order.index(person['father']), order.index(name))
+
+    def test_assignments_match_joint_probability(self):
+        unknown = [name for name in self.people if self.people[name]['trait'] is None]
+        count = 0
+        for one_gene, two_genes, have_trait, p in h.assignments(self.people):
+            count += 1
+            for name, person in self.people.items():
+                if person['trait'] is not None:
+                    self.assertEqual(name in have_trait, person['trait'])
+            expected = h.joint_probability(self.people, one_gene, two_genes, have_trait)
+            self.assertAlmostEqual(p, expected)
+        self.assertEqual(count, 3 ** len(self.people) * 2 ** len(unknown))
+
+    def test_zero_probability_pruned(self):
+        # Nobody without the gene has the trait
+        probs = deepcopy(h.PROBS)
+        probs['trait'][0] = {True: 0, False: 1}
+        with mock.patch.object(h, 'PROBS', probs):
+            for one_gene, two_genes, have_trait, p in h.assignments(self.people):
+                self.assertGreater(p, 0)
+                self.assertLessEqual(have_trait, one_gene | two_genes)
+            probabilities = h.enumerate_probabilities(self.people)
+        self.assertEqual(probabilities['Fred']['gene'][0], 0)
+
+# End class
+
+class EliminationTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.families = [h.load_data(f'data/family{i}.csv') for i in range(3)]
+
+    def assertProbabilitiesAlmostEqual(self, result, expected, places=7):
+        self.assertSetEqual(set(result), set(expected))
+        for person in expected:
+            for field in expected[person]:
+                for value, p in expected[person][field].items():
+                    with self.subTest(person=person, field=field, value=value):
+                        self.assertAlmostEqual(result[person][field][value], p, places=places)
+
+    def test_inheritance_table(self):
+        table = h.inheritance_table(0.01)
+        for father in range(3):
+            for mother in range(3):
+                expected = h.get_probs_inherited_nr_genes(father, mother, 0.01)
+                for gene in range(3):
+                    with self.subTest(father=father, mother=mother, gene=gene):
+                        self.assertAlmostEqual(table[gene, mother, father], expected[gene])
+
+    def test_matches_enumeration(self):
+        for people in self.families:
+            result = h.eliminate_probabilities(people)
+            expected = h.enumerate_probabilities(people)
+            self.assertProbabilitiesAlmostEqual(result, expected, places=12)
+
+    def test_large_family(self):
+        # A line of 2000 generations, each child of the previous one and
+        # a new founder, with alternating known traits
+        people = {'person0': {'name': 'person0', 'mother': None, 'father': None, 'trait': True}}
+        for i in range(1, 2000):
+            people[f'founder{i}'] = {'name': f'founder{i}', 'mother': None, 'father': None, 'trait': None}
+            people[f'person{i}'] = {
+                'name': f'person{i}', 'mother': f'person{i - 1}', 'father': f'founder{i}',
+                'trait': [None, True, False][i % 3]
+            }
+        probabilities = h.eliminate_probabilities(people)
+        for person in people:
+            with self.subTest(person=person):
+                self.assertAlmostEqual(sum(probabilities[person]['gene'].values()), 1)
+                self.assertAlmostEqual(sum(probabilities[person]['trait'].values()), 1)
+        self.assertEqual(probabilities['person1']['trait'][True], 1)
+
+# End class
+
+class VectorizedTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.families = [h.load_data(f'data/family{i}.csv') for i in range(3)]
+
+    def test_joint_probabilities(self):
+        people = self.families[0]
+        names = list(people)
+        tables = h.probability_tables(people)
+        # [one_gene, two_genes, have_trait]
+        cases = [
+            [{"Harry"}, {"James"}, {"James"}],
+            [set(), set(), set()],
+            [{"Lily"}, {"Harry", "James"}, {"Harry", "James"}],
+        ]
+        genes = np.array([[h.get_nr_genes(name, one, two) for name in names] for one, two, _ in cases])
+        traits = np.array([[name in have for name in names] for _, _, have in cases])
+
+        result = h.joint_probabilities(tables, genes, traits)
+        for i, (one_gene, two_genes, have_trait) in enumerate(cases):
+            with self.subTest(one_gene=one_gene, two_genes=two_genes, have_trait=have_trait):
+                expected = h.joint_probability(people, one_gene, two_genes, have_trait)
+                self.assertAlmostEqual(result[i], expected)
+
+    def test_matches_enumeration(self):
+        for people in self.families:
+            result = h.vectorized_probabilities(people)
+            expected = h.enumerate_probabilities(people)
+            for person in expected:
+                for field in expected[person]:
+                    for value, p in expected[person][field].items():
+                        with self.subTest(person=person, field=field, value=value):
+                            self.assertAlmostEqual(result[person][field][value], p, places=12)
+
+# End class
+
+class SamplingTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.families = [h.load_data(f'data/family{i}.csv') for i in range(3)]
+        cls.expected = [h.enumerate_probabilities(people) for people in cls.families]
+
+    def assertWithinError(self, people, expected, sampler, **kwargs):
+        probabilities, errors = sampler(people, **kwargs)
+        for person in expected:
+            for field in expected[person]:
+                for value, p in expected[person][field].items():
+                    with self.subTest(sampler=sampler.__name__, person=person, field=field, value=value):
+                        # Well within 5 standard errors, with some slack for
+                        # estimates whose error is close to 0
+                        error = errors[person][field][value]
+                        self.assertLess(abs(probabilities[person][field][value] - p), 5 * error + 0.005)
+                        self.assertLess(error, 0.01)
+
+    def test_likelihood_weighting(self):
+        for people, expected in zip(self.families, self.expected):
+            self.assertWithinError(people, expected, h.likelihood_weighting, n=50000, seed=0)
+
+    def test_gibbs_sampling(self):
+        for people, expected in zip(self.families, self.expected):
+            self.assertWithinError(people, expected, h.gibbs_sampling, n=20000, seed=0, chains=50)
+
+    def test_seeded(self):
+        people = self.families[2]
+        for sampler in (h.likelihood_weighting, h.gibbs_sampling):
+            with self.subTest(sampler=sampler.__name__):
+                self.assertEqual(sampler(people, n=1000, seed=1), sampler(people, n=1000, seed=1))
+
+    def test_known_traits(self):
+        people = self.families[0]
+        probabilities, errors = h.gibbs_sampling(people, n=1000, seed=0, chains=10)
+        self.assertEqual(probabilities["James"]["trait"], {True: 1.0, False: 0.0})
+        self.assertEqual(errors["James"]["trait"], {True: 0.0, False: 0.0})
+
+# End class
+
+class ModelTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.people = h.load_data('data/family2.csv')
+
+    def test_default_model(self):
+        model = h.Model()
+        self.assertEqual(model.founder, [h.PROBS['gene'][g] for g in range(3)])
+        self.assertEqual(model.traits, [h.PROBS['trait'][g] for g in range(3)])
+        for mother in range(3):
+            for father in range(3):
+                rounded = h.get_probs_inherited_nr_genes(father, mother, h.PROBS['mutation'])
+                for gene in range(3):
+                    with self.subTest(mother=mother, father=father, gene=gene):
+                        self.assertAlmostEqual(model.inherited[mother][father][gene], rounded[gene], places=4)
+
+    def test_full_precision(self):
+        model = h.Model(mutation=0.123456)
+        self.assertAlmostEqual(model.inherited[1][2][2], 0.5 * (1 - 0.123456), places=15)
+        self.assertAlmostEqual(model.inherited[0][0][1], 2 * 0.123456 * (1 - 0.123456), places=15)
+
+    def test_load(self):
+        data = {"mutation": 0.05, "trait": {"0": {"true": 0.1, "false": 0.9}, "1": {"true": 0.5, "false": 0.5}, "2": {"true": 0.9, "false": 0.1}}}
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'model.json')
+            with open(filename, 'w') as f:
+                json.dump(data, f)
+            model = h.Model.load(filename)
+        self.assertEqual(model.mutation, 0.05)
+        self.assertEqual(model.traits[2], {True: 0.9, False: 0.1})
+        self.assertEqual(model.founder, [h.PROBS['gene'][g] for g in range(3)])
+
+    def test_load_raises_value_error_if_trait_invalid(self):
+        data = {"trait": {"0": {"True": 0.1, "false": 0.9}}}
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'model.json')
+            with open(filename, 'w') as f:
+                json.dump(data, f)
+            with self.assertRaises(ValueError):
+                h.Model.load(filename)
+
+    def test_invalid(self):
+        probs = deepcopy(h.PROBS)
+        probs['gene'][0] = 0.5
+        with self.assertRaises(ValueError):
+            h.Model(probs)
+        with self.assertRaises(ValueError):
+            h.Model(mutation=1.5)
+
+    def test_methods_use_model(self):
+        model = h.Model(mutation=0.2)
+        expected = h.enumerate_probabilities(self.people, model=model)
+        self.assertNotAlmostEqual(
+            expected['Ron']['gene'][1], h.enumerate_probabilities(self.people)['Ron']['gene'][1], places=3
+        )
+        for method in (h.vectorized_probabilities, h.eliminate_probabilities):
+            result = method(self.people, model=model)
+            for person in expected:
+                for field in expected[person]:
+                    for value, p in expected[person][field].items():
+                        with self.subTest(method=method.__name__, person=person, field=field, value=value):
+                            self.assertAlmostEqual(result[person][field][value], p, places=12)
+        result, errors = h.gibbs_sampling(self.people, n=10000, seed=0, chains=50, model=model)
+        for person in expected:
+            with self.subTest(method='gibbs_sampling', person=person):
+                self.assertLess(abs(result[person]['gene'][1] - expected[person]['gene'][1]), 5 * errors[person]['gene'][1] + 0.005)
+
+    def test_default_model_is_built_once(self):
+        model = h.default_model()
+        self.assertIs(h.default_model(), model)
+        self.assertEqual(model.founder, h.Model().founder)
+
+        # Changes to PROBS are picked up
+        with mock.patch.dict(h.PROBS, {'mutation': 0.2}):
+            changed = h.default_model()
+            self.assertIsNot(changed, model)
+            self.assertEqual(changed.mutation, 0.2)
+            self.assertIs(h.default_model(), changed)
+        self.assertEqual(h.default_model().mutation, h.PROBS['mutation'])
+
+# End class
+
 
 def suite():
     suite = unittest.TestSuite()
@@ -115,6 +377,31 @@ def suite():
     suite.addTest(JointProbabilityTestCase('test_get_nr_genes_returns_two'))
     suite.addTest(JointProbabilityTestCase('test_get_probs_inherited_nr_genes'))
     suite.addTest(JointProbabilityTestCase('test_joint_probability'))
+
+    suite.addTest(AssignmentsTestCase('test_powerset_is_lazy'))
+    suite.addTest(AssignmentsTestCase('test_parents_first'))
+    suite.addTest(AssignmentsTestCase('test_assignments_match_joint_probability'))
+    suite.addTest(AssignmentsTestCase('test_zero_probability_pruned'))
+
+    suite.addTest(EliminationTestCase('test_inheritance_table'))
+    suite.addTest(EliminationTestCase('test_matches_enumeration'))
+    suite.addTest(EliminationTestCase('test_large_family'))
+
+    suite.addTest(VectorizedTestCase('test_joint_probabilities'))
+    suite.addTest(VectorizedTestCase('test_matches_enumeration'))
+
+    suite.addTest(SamplingTestCase('test_likelihood_weighting'))
+    suite.addTest(SamplingTestCase('test_gibbs_sampling'))
+    suite.addTest(SamplingTestCase('test_seeded'))
+    suite.addTest(SamplingTestCase('test_known_traits'))
+
+    suite.addTest(ModelTestCase('test_default_model'))
+    suite.addTest(ModelTestCase('test_full_precision'))
+    suite.addTest(ModelTestCase('test_load'))
+    suite.addTest(ModelTestCase('test_load_raises_value_error_if_trait_invalid'))
+    suite.addTest(ModelTestCase('test_invalid'))
+    suite.addTest(ModelTestCase('test_methods_use_model'))
+    suite.addTest(ModelTestCase('test_default_model_is_built_once'))
         
     return suite
 
@@ -1,3 +1,10 @@
+import hashlib
+import itertools
+import os
+
+import numpy as np
+
+
 class Variable():
 
     ACROSS = "across"
@@ -35,9 +42,152 @@ class Variable():
         return f"Variable({self.i}, {self.j}, {direction}, {self.length})"
 
 
+class Vocabulary():
+
+    def __init__(self, words):
+        """
+        Index `words` for crossword search.
+
+        Words are numbered by length, then alphabetically, so the words of
+        each length have consecutive numbers, starting at `self.starts`.
+        They are stored in `self.codes`, mapping each length to an array of
+        letter codes with one row per word. `self.postings` maps each
+        (length, position) to a tuple (numbers, letters, bounds): the
+        numbers of the words of that length sorted by their letter at that
+        position, the sorted letter codes that occur there, and where the
+        numbers of the words with each letter begin and end in `numbers`.
+        Empty words are left out.
+
+        `self.source` identifies where the words came from (None unless
+        set), and is saved along with the index.
+        """
+        self.words = sorted(sorted(word for word in words if word), key=len)
+        self.source = None
+        self.codes = dict()
+        self.starts = dict()
+        start = 0
+        for length, group in itertools.groupby(self.words, key=len):
+            group = list(group)
+            self.starts[length] = start
+            self.codes[length] = np.array(group).view(np.uint32).reshape(len(group), length)
+            start += len(group)
+
+        self.postings = dict()
+        for length, codes in self.codes.items():
+            for position in range(length):
+                column = codes[:, position]
+                order = np.argsort(column, kind="stable")
+                letters, first = np.unique(column[order], return_index=True)
+                self.postings[length, position] = (
+                    order + self.starts[length],
+                    letters,
+                    np.append(first, len(order))
+                )
+
+    def __len__(self):
+        return len(self.words)
+
+    def numbers(self, length):
+        """
+        Return the range of the numbers of the words of `length`.
+        """
+        start = self.starts.get(length, 0)
+        return range(start, start + len(self.codes.get(length, ())))
+
+    def posting(self, length, position, letter):
+        """
+        Return the sorted array of the numbers of the words of `length`
+        with `letter` at `position`. (The sort by letter was stable, so
+        numbers are already sorted for each letter.)
+        """
+        if (length, position) not in self.postings:
+            return np.zeros(0, dtype=np.int64)
+        numbers, letters, bounds = self.postings[length, position]
+        k = np.searchsorted(letters, ord(letter))
+        if k == len(letters) or letters[k] != ord(letter):
+            return np.zeros(0, dtype=np.int64)
+        return numbers[bounds[k]:bounds[k + 1]]
+
+    def search(self, pattern, blank="?"):
+        """
+        Return the words matching `pattern`, such as "A??LE", where `blank`
+        stands for any letter, in the order of their numbers.
+        """
+        numbers = np.arange(self.numbers(len(pattern)).start, self.numbers(len(pattern)).stop)
+        for position, letter in enumerate(pattern):
+            if letter != blank:
+                numbers = np.intersect1d(
+                    numbers, self.posting(len(pattern), position, letter), assume_unique=True
+                )
+        return [self.words[k] for k in numbers]
+
+    def save(self, filename):
+        """
+        Save the index to `filename`, a NumPy `.npz` file.
+        """
+        arrays = dict()
+        for length, codes in self.codes.items():
+            arrays[f"codes {length}"] = codes
+        for (length, position), (numbers, letters, bounds) in self.postings.items():
+            arrays[f"numbers {length} {position}"] = numbers
+            arrays[f"letters {length} {position}"] = letters
+            arrays[f"bounds {length} {position}"] = bounds
+        if self.source is not None:
+            arrays["source"] = np.array(self.source)
+        with open(filename, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load an index saved by `save` from `filename`.
+        """
+        vocabulary = cls.__new__(cls)
+        vocabulary.codes = dict()
+        vocabulary.starts = dict()
+        vocabulary.postings = dict()
+        with np.load(filename) as arrays:
+            vocabulary.source = str(arrays["source"]) if "source" in arrays.files else None
+            for key in sorted(
+                (key for key in arrays.files if key.startswith("codes ")),
+                key=lambda key: int(key.split()[1])
+            ):
+                length = int(key.split()[1])
+                vocabulary.codes[length] = arrays[key]
+            start = 0
+            words = []
+            for length, codes in vocabulary.codes.items():
+                vocabulary.starts[length] = start
+                words.extend(np.ascontiguousarray(codes).view(f"<U{length}").ravel().tolist())
+                start += len(codes)
+                for position in range(length):
+                    vocabulary.postings[length, position] = tuple(
+                        arrays[f"{name} {length} {position}"]
+                        for name in ["numbers", "letters", "bounds"]
+                    )
+        vocabulary.words = words
+        return vocabulary
+
+
+class Overlaps(dict):
+    """
+    Dictionary of the overlaps of pairs of variables, holding only the
+    pairs that overlap: the overlap of any other pair is None.
+    """
+
+    def __missing__(self, key):
+        return None
+
+
 class Crossword():
 
-    def __init__(self, structure_file, words_file):
+    def __init__(self, structure_file, words_file, cache=None):
+        """
+        Load the crossword structure and vocabulary from files. If `cache`
+        is given, the `Vocabulary` index is loaded from that file when it
+        was built from the same contents of `words_file` (by SHA-256 hash);
+        otherwise it is built and saved there.
+        """
 
         # Determine structure of crossword
         with open(structure_file) as f:
@@ -57,9 +207,21 @@ class Crossword():
                         row.append(False)
                 self.structure.append(row)
 
-        # Save vocabulary list
+        # Save vocabulary list, and index it
         with open(words_file) as f:
-            self.words = set(f.read().upper().splitlines())
+            contents = f.read()
+        self.words = set(contents.upper().splitlines())
+        source = hashlib.sha256(contents.encode()).hexdigest()
+        self.vocabulary = None
+        if cache and os.path.exists(cache):
+            self.vocabulary = Vocabulary.load(cache)
+            if self.vocabulary.source != source:
+                self.vocabulary = None
+        if self.vocabulary is None:
+            self.vocabulary = Vocabulary(self.words)
+            self.vocabulary.source = source
+            if cache:
+                self.vocabulary.save(cache)
 
         # Determine variable set
         self.variables = set()
@@ -108,26 +270,25 @@ class Crossword():
         # For any pair of variables v1, v2, their overlap is either:
         #    None, if the two variables do not overlap; or
         #    (i, j), where v1's ith character overlaps v2's jth character
-        self.overlaps = dict()
-        for v1 in self.variables:
-            for v2 in self.variables:
-                if v1 == v2:
-                    continue
-                cells1 = v1.cells
-                cells2 = v2.cells
-                intersection = set(cells1).intersection(cells2)
-                if not intersection:
-                    self.overlaps[v1, v2] = None
-                else:
-                    intersection = intersection.pop()
-                    self.overlaps[v1, v2] = (
-                        cells1.index(intersection),
-                        cells2.index(intersection)
-                    )
+        # Only overlapping pairs are stored, found from the variables
+        # through each cell.
+        cells = dict()
+        for var in self.variables:
+            for k, cell in enumerate(var.cells):
+                cells.setdefault(cell, []).append((var, k))
+        self.overlaps = Overlaps()
+        for through in cells.values():
+            for v1, i in through:
+                for v2, j in through:
+                    if v1 != v2:
+                        self.overlaps[v1, v2] = (i, j)
+
+        # Neighbors of each variable, computed once
+        adjacency = {var: [] for var in self.variables}
+        for v1, v2 in self.overlaps:
+            adjacency[v1].append(v2)
+        self.adjacency = {var: frozenset(adjacent) for var, adjacent in adjacency.items()}
 
     def neighbors(self, var):
         """Given a variable, return set of overlapping variables."""
-        return set(
-            v for v in self.variables
-            if v != var and self.overlaps[v, var]
-        )
+        return self.adjacency[var]
@@ -1,22 +1,166 @@
+import multiprocessing
+import os
+import random
 import sys
-from queue import Queue
+import types
+from collections import deque
 
 import numpy as np
 
 from crossword import *
 
+# Largest domain ordered in full by `order_domain_values`; larger domains
+# are ordered from an evenly spaced sample of this many words
+ORDER_SAMPLE = 20000
+
+# Failures allowed in the first run of a restarting search; run k is
+# allowed RESTART_BASE * luby(k) failures
+RESTART_BASE = 100
+
 
 class CrosswordCreator():
 
-    def __init__(self, crossword):
+    def __init__(self, crossword, seed=None):
         """
         Create new CSP crossword generate.
+
+        Words are numbered, and the domain of each variable is kept in
+        `self.masks` as a bitmask over word numbers: bit k is set if word
+        k is in the domain. Every change to a domain is recorded in
+        `self.trail`, as (variable, previous bitmask), so that it can be
+        undone.
+
+        If `seed` is given, ties between variables and between values are
+        broken at random, with a generator seeded with `seed`; otherwise
+        the search is deterministic.
         """
         self.crossword = crossword
-        self.domains = {
-            var: self.crossword.words.copy()
+        vocabulary = getattr(crossword, "vocabulary", None)
+        self.index_words(vocabulary or Vocabulary(self.crossword.words))
+        everything = (1 << len(self.words)) - 1
+        self.masks = {
+            var: everything
             for var in self.crossword.variables
         }
+        self.trail = []
+        self.random = random.Random(seed) if seed is not None else None
+
+        # failures so far in the current run, and the number allowed before
+        # a restart (None for no limit)
+        self.failures = 0
+        self.limit = None
+
+    @property
+    def domains(self):
+        """
+        Read-only mapping of each variable to the frozenset of words in its
+        domain. It is built from `self.masks` on every access, so modifying
+        it raises TypeError: to change a domain, assign to `self.domains`
+        or update `self.masks`.
+        """
+        return types.MappingProxyType({
+            var: frozenset(self.decode(mask)) for var, mask in self.masks.items()
+        })
+
+    @domains.setter
+    def domains(self, domains):
+        self.masks = {var: self.encode(words) for var, words in domains.items()}
+        self.trail = []
+
+    def restrict(self, var, mask):
+        """
+        Set the domain of `var` to bitmask `mask`, recording its previous
+        domain in `self.trail`.
+        """
+        self.trail.append((var, self.masks[var]))
+        self.masks[var] = mask
+
+    def undo(self, mark):
+        """
+        Restore the domains changed since `self.trail` had length `mark`,
+        most recent change first.
+        """
+        trail = self.trail
+        while len(trail) > mark:
+            var, mask = trail.pop()
+            self.masks[var] = mask
+
+    def index_words(self, vocabulary):
+        """
+        Number words like `vocabulary` (a `Vocabulary`), and turn its
+        index into bitmasks:
+            * `self.lengths` maps each length to the bitmask of the words
+              of that length,
+            * `self.letters` maps each (length, position) to a dictionary
+              mapping each letter to the bitmask of the words of that
+              length with that letter at that position.
+        """
+        self.words = list(vocabulary.words)
+        self.numbers = dict(zip(self.words, range(len(self.words))))
+        self.lengths = dict()
+        self.letters = dict()
+
+        # Words of the same length have consecutive numbers
+        for length, codes in vocabulary.codes.items():
+            start = vocabulary.starts[length]
+            self.lengths[length] = ((1 << len(codes)) - 1) << start
+            for position in range(length):
+                numbers, letters, bounds = vocabulary.postings[length, position]
+                self.letters[length, position] = dict()
+                for k, letter in enumerate(letters.tolist()):
+                    bits = np.zeros(len(codes), dtype=bool)
+                    bits[numbers[bounds[k]:bounds[k + 1]] - start] = True
+                    self.letters[length, position][chr(letter)] = bitmask(bits) << start
+
+    def number(self, word):
+        """
+        Return the number of `word`, indexing it first if it is not known.
+        """
+        k = self.numbers.get(word)
+        if k is None:
+            k = len(self.words)
+            self.words.append(word)
+            self.numbers[word] = k
+            bit = 1 << k
+            self.lengths[len(word)] = self.lengths.get(len(word), 0) | bit
+            for position, letter in enumerate(word):
+                letters = self.letters.setdefault((len(word), position), dict())
+                letters[letter] = letters.get(letter, 0) | bit
+        return k
+
+    def encode(self, words):
+        """
+        Return the bitmask of the set of `words`.
+        """
+        bits = np.zeros(len(self.words) + len(words), dtype=bool)
+        bits[[self.number(word) for word in words]] = True
+        return bitmask(bits)
+
+    def decode(self, mask):
+        """
+        Return the set of words in bitmask `mask`.
+        """
+        return {self.words[k] for k in bit_indices(mask)}
+
+    def matching(self, var, position, letter):
+        """
+        Return the bitmask of the words of the length of `var` with
+        `letter` at `position`.
+        """
+        return self.letters.get((var.length, position), {}).get(letter, 0)
+
+    def supported(self, x, y):
+        """
+        Return the bitmask of the words for `x` that agree with at least
+        one word in the domain of `y` where they overlap.
+        """
+        i, j = self.crossword.overlaps[x, y]
+        mask = self.masks[y]
+        supported = 0
+        for letter, words in self.letters.get((y.length, j), {}).items():
+            if mask & words:
+                supported |= self.matching(x, i, letter)
+        return supported
 
     def letter_grid(self, assignment):
         """
@@ -88,13 +232,33 @@ class CrosswordCreator():
 
         img.save(filename)
 
-    def solve(self):
+    def solve(self, restarts=False):
         """
         Enforce node and arc consistency, and then solve the CSP.
+
+        If `restarts` is True, the search starts over once its k-th run has
+        failed RESTART_BASE * luby(k) times, which only helps if ties are
+        broken at random (see `seed`). The limits grow without bound, so
+        None still means that there is no solution.
         """
         self.enforce_node_consistency()
-        self.ac3()
-        return self.backtrack(dict())
+        if not self.ac3():
+            return None
+
+        # changes made so far never need to be undone
+        self.trail.clear()
+        if not restarts:
+            return self.backtrack(dict())
+
+        run = 1
+        while True:
+            self.failures = 0
+            self.limit = RESTART_BASE * luby(run)
+            assignment = self.backtrack(dict())
+            if assignment is not None or self.failures < self.limit:
+                self.limit = None
+                return assignment
+            run += 1
 
     def enforce_node_consistency(self):
         """
@@ -102,12 +266,11 @@ class CrosswordCreator():
         (Remove any values that are inconsistent with a variable's unary
          constraints; in this case, the length of the word.)
         """
-        for var in self.domains:
-            var_length = var.length
-            words = self.domains[var]
-            # create set of words whose length == variable length
-            consistent_words = [word for word in words if len(word) == var_length]
-            words.intersection_update(consistent_words)
+        for var in self.masks:
+            # keep words whose length == variable length
+            mask = self.masks[var] & self.lengths.get(var.length, 0)
+            if mask != self.masks[var]:
+                self.restrict(var, mask)
 
 
     def revise(self, x, y):
@@ -125,10 +288,10 @@ class CrosswordCreator():
         if not self.crossword.overlaps[x, y]:
             return revised
 
-        words_to_remove = self.get_words_to_remove(x, y)
-        # remove words from x's domain
-        if len(words_to_remove) > 0:
-            self.domains[x].difference_update(words_to_remove)
+        # keep words of x that agree with some word of y
+        supported = self.masks[x] & self.supported(x, y)
+        if supported != self.masks[x]:
+            self.restrict(x, supported)
             revised = True
         
         return revised
@@ -143,23 +306,26 @@ class CrosswordCreator():
         return False if one or more domains end up empty.
         """
         # initiate queue if not exist
-        if not arcs:
-            arcs = Queue()
-            for arc in self.crossword.overlaps:
-                arcs.put(arc)
+        if arcs is None:
+            arcs = self.crossword.overlaps
+        queue = deque(arcs)
+        queued = set(queue)
 
-        while not arcs.empty():
+        while queue:
             # consider arc if consistent
-            x, y = arcs.get()
+            arc = queue.popleft()
+            queued.discard(arc)
+            x, y = arc
             if self.revise(x, y):
-                if len(self.domains[x]) == 0:
+                if not self.masks[x]:
                     # domain of x is empty --> problem is unsolvable
                     return False
                 else:
-                    # add neighbours of x to queue
+                    # add neighbours of x to queue, unless already there
                     for n in self.crossword.neighbors(x):
-                        if n != y:
-                            arcs.put((n, x))
+                        if n != y and (n, x) not in queued:
+                            queue.append((n, x))
+                            queued.add((n, x))
 
         return True
 
@@ -173,11 +339,31 @@ class CrosswordCreator():
         return (self.crossword.variables == word_assigned)
     
 
-    def consistent(self, assignment):
+    def consistent(self, assignment, var=None, used=None):
         """
         Return True if `assignment` is consistent (i.e., words fit in crossword
         puzzle without conflicting characters); return False otherwise.
+
+        If `var` is given, the rest of `assignment` is known to be consistent,
+        and only the word of `var` is checked, against the words of its
+        assigned neighbors and against `used`, the set of the other words in
+        `assignment` (built from `assignment` if not given).
         """
+        if var is not None:
+            word = assignment[var]
+            if len(word) != var.length:
+                return False
+            if used is None:
+                used = set(assignment[other] for other in assignment if other != var)
+            if word in used:
+                return False
+            for neighbor in self.crossword.neighbors(var):
+                if neighbor in assignment:
+                    i, j = self.crossword.overlaps[var, neighbor]
+                    if word[i] != assignment[neighbor][j]:
+                        return False
+            return True
+
         # check all values are distinct -> if not distinct set of values will be shorter than set of keys
         if len(set(assignment.values())) != len(set(assignment.keys())):
             return False
@@ -209,22 +395,51 @@ class CrosswordCreator():
         the number of values they rule out for neighboring variables.
         The first value in the list, for example, should be the one
         that rules out the fewest values among the neighbors of `var`.
-        """        
-        domain_values = list(self.domains[var])
+
+        A word rules out the words of a neighbor with another letter where
+        they overlap, so the counts come from a histogram of the letters of
+        each neighbor's domain at the overlap. Domains larger than
+        `ORDER_SAMPLE` are ordered from an evenly spaced sample: the sample
+        comes first, in order, followed by the rest of the domain.
+
+        Ties are broken at random if the creator was given a seed.
+        """
+        domain_values = [self.words[k] for k in bit_indices(self.masks[var])]
+        if self.random:
+            self.random.shuffle(domain_values)
+        rest = []
+        if len(domain_values) > ORDER_SAMPLE:
+            step = len(domain_values) / ORDER_SAMPLE
+            sample = set(int(k * step) for k in range(ORDER_SAMPLE))
+            rest = [word for k, word in enumerate(domain_values) if k not in sample]
+            domain_values = [domain_values[k] for k in sorted(sample)]
+
+        # for each unassigned neighbor: (position of the overlap in var,
+        # size of the domain, number of words with each letter there)
+        histograms = []
+        for neighbor in self.crossword.neighbors(var):
+            # consider only neighboring unassigned variables
+            if neighbor in assignment:
+                continue
+            i, j = self.crossword.overlaps[neighbor, var]
+            mask = self.masks[neighbor]
+            histogram = {
+                letter: (mask & words).bit_count()
+                for letter, words in self.letters.get((neighbor.length, i), {}).items()
+            }
+            histograms.append((j, mask.bit_count(), histogram))
+
         eliminations = {} # dict{word: nr of value ruled out}
         # for each word in var's domain count the number of eliminations
-        for word in self.domains[var]:
+        for word in domain_values:
             count = 0
-            for neighbor in self.crossword.neighbors(var):
-                # consider only neighboring unassigned variables
-                if neighbor in assignment:
-                    continue
-                words_to_remove = self.get_words_to_remove(neighbor, var, word)
-                count += len(words_to_remove)
-            eliminations[word] = count        
-        
-        # return list sorted by number of eliminations
-        return sorted(domain_values, key=lambda word: eliminations[word])
+            for j, size, histogram in histograms:
+                count += size - histogram.get(word[j], 0)
+            eliminations[word] = count
+
+        # return list sorted by number of eliminations (sorting is stable,
+        # so shuffled ties stay shuffled)
+        return sorted(domain_values, key=lambda word: eliminations[word]) + rest
 
 
     def select_unassigned_variable(self, assignment):
@@ -233,13 +448,14 @@ class CrosswordCreator():
         Choose the variable with the minimum number of remaining values
         in its domain. If there is a tie, choose the variable with the highest
         degree. If there is a tie, any of the tied variables are acceptable
-        return values.
+        return values: the first one, or a random one if the creator was
+        given a seed.
         """
         # select all unassigned variables
-        selected_variables = np.array([var for var in self.domains if var not in assignment])
+        selected_variables = np.array([var for var in self.masks if var not in assignment])
         
         # select variables with the minimum number of remaining values
-        remaining_values = np.array([len(self.domains[var]) for var in selected_variables])
+        remaining_values = np.array([self.masks[var].bit_count() for var in selected_variables])
         indices = np.where(remaining_values == remaining_values.min())[0]
         
         # if tie, select variables with highest degree (nr of neighbors)
@@ -250,19 +466,30 @@ class CrosswordCreator():
             degrees = np.array([len(self.crossword.neighbors(var)) for var in selected_variables])
             indices = np.where(degrees == degrees.max())[0]
         
-        ndx = indices[0]        
+        ndx = self.random.choice(indices) if self.random else indices[0]
         return selected_variables[ndx]
 
 
-    def backtrack(self, assignment):
+    def backtrack(self, assignment, used=None):
         """
         Using Backtracking Search, take as input a partial assignment for the
         crossword and return a complete assignment if possible to do so.
 
-        `assignment` is a mapping from variables (keys) to words (values).
+        `assignment` is a mapping from variables (keys) to words (values),
+        and `used` the set of its words, kept up to date as words are
+        assigned (built from `assignment` if not given). Each new word is
+        checked for consistency on its own.
 
-        If no assignment is possible, return None.
+        Arc consistency is maintained after every assignment, and the domain
+        changes it makes are undone from `self.trail` when a word fails.
+        Every failed word counts towards `self.failures`.
+
+        If no assignment is possible, or `self.limit` failures are reached,
+        return None (with the domains as they were).
         """
+        if used is None:
+            used = set(assignment.values())
+
         # if assignment is complete -> return assignment
         if self.assignment_complete(assignment):
             return assignment
@@ -272,23 +499,44 @@ class CrosswordCreator():
 
         # iterate domain values - using least-constraining heuristic
         for word in self.order_domain_values(var, assignment):
+            # give up once the run has failed too often
+            if self.limit is not None and self.failures >= self.limit:
+                return None
+
             # if value consistent with assignment
             assignment[var] = word
-            inferences = dict()
-            if self.consistent(assignment):  
-                # maintain arc-consistency
+            if self.consistent(assignment, var, used):
+                used.add(word)
+
+                # maintain arc-consistency, remembering where the trail
+                # was to undo the domain changes if this word fails
+                mark = len(self.trail)
                 inferences = self.inference(var, assignment)
-                if inferences:
-                    # add inferences to assignment
-                    assignment.update(inferences)
-                # recursively run Backtrack
-                result = self.backtrack(assignment)           
-                if result:
-                    return result
-            # delete var and inferences from assignment
+
+                # add inferences to assignment, checking each new word
+                added = []
+                for inferred, inferred_word in (inferences or {}).items():
+                    assignment[inferred] = inferred_word
+                    if not self.consistent(assignment, inferred, used):
+                        assignment.pop(inferred)
+                        break
+                    used.add(inferred_word)
+                    added.append(inferred)
+                else:
+                    if inferences is not None:
+                        # recursively run Backtrack
+                        result = self.backtrack(assignment, used)
+                        if result:
+                            return result
+
+                # delete inferences from assignment
+                for inferred in added:
+                    used.discard(assignment.pop(inferred))
+                used.discard(word)
+                self.undo(mark)
+            # delete var from assignment
             assignment.pop(var)
-            for inference in inferences:
-                assignment.pop(inference)
+            self.failures += 1
 
         return None
 
@@ -297,19 +545,21 @@ class CrosswordCreator():
         """
         Returns all the inferences that can be made through enforcing arc-consistency.
 
+        The domain of `x` is reduced to its assigned word first, so that
+        AC-3 starts by forward checking the neighbours of `x`.
+
         @param assignment   current assignment (dictionary)
         @param x            Variable, that last assignment was made to
         @return             inferences: dict(Variable: value) or None if AC-3 was failure
         """
+        self.restrict(x, 1 << self.number(assignment[x]))
+
         # create a queue of arcs between neighbours of var and var
-        arcs = Queue()
-        for neighbour in self.crossword.neighbors(x):
-            arc = (neighbour, x)
-            arcs.put(arc)
-        
+        arcs = [(neighbour, x) for neighbour in self.crossword.neighbors(x)]
+
         # run AC-3, check if it wasn't failure
         result = self.ac3(arcs)
-        if result is None:
+        if not result:
             return None
 
         # gather inferences
@@ -326,9 +576,9 @@ class CrosswordCreator():
         @return             inferences: dict(Variable: value)
         """
         inferences = {
-            var:tuple(words)[0] for (var, words) in self.domains.items() # 'var:words[0]' doesn't work (TypeError: 'set' object does not support indexing)
-            if var not in assignment 
-            if len(words) == 1
+            var: self.words[mask.bit_length() - 1] for (var, mask) in self.masks.items()
+            if var not in assignment
+            if mask.bit_count() == 1
         }
         return inferences
 
@@ -343,37 +593,131 @@ class CrosswordCreator():
                         that conflicts with word_y
         @return         set of values (strings)
         """
-        words_to_remove = set()
         i, j = self.crossword.overlaps[x, y] # where x's ith character overlaps y's jth character
-        for word_x in self.domains[x]:
-            char_i = word_x[i]
-            # boolean mask: element is True if characters correspond
-            if word_y:
-                jth_chars_corresp = [(word_y[j] == char_i)]    
-            else:
-                jth_chars_corresp = [word_y[j] == char_i for word_y in self.domains[y]]
-            if any(jth_chars_corresp):
-                continue
-            else:
-                words_to_remove.add(word_x)
-        return words_to_remove
+        if word_y:
+            supported = self.matching(x, i, word_y[j])
+        else:
+            supported = self.supported(x, y)
+        return self.decode(self.masks[x] & ~supported)
+
+
+def bitmask(bits):
+    """
+    Return the bitmask with bit k set for every true `bits[k]`.
+    """
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+
+def bit_indices(mask):
+    """
+    Return the array of the positions of the bits set in `mask`, in order.
+    """
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder="little")
+    return np.flatnonzero(bits)
+
+
+def luby(k):
+    """
+    Return the k-th term of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, ...
+    (counting from 1).
+    """
+    # the sequence up to 2^i - 1 is itself twice, followed by 2^(i - 1)
+    i = 1
+    while (1 << i) - 1 < k:
+        i += 1
+    if k == (1 << i) - 1:
+        return 1 << (i - 1)
+    return luby(k - (1 << (i - 1)) + 1)
+
+
+def portfolio(crossword, searches=None, budget=None):
+    """
+    Solve `crossword` with `searches` searches (by default one per CPU), in
+    parallel processes. Search 0 is the plain `CrosswordCreator.solve`;
+    search k > 0 breaks ties at random, seeded with k, and restarts on a
+    Luby schedule.
+
+    Return the assignment of the first search to finish, or None if it
+    found that there is no solution; the other searches are then stopped.
+    Raise TimeoutError if no search has finished after `budget` seconds.
+    """
+    if searches is None:
+        searches = os.cpu_count() or 1
+    if searches < 1:
+        raise ValueError(f"need at least one search, not {searches}")
+    with multiprocessing.Pool(searches, initializer=start_search, initargs=(crossword,)) as pool:
+        # leaving the block terminates the searches still running
+        results = pool.imap_unordered(search, range(searches))
+        try:
+            return results.next(timeout=budget)
+        except multiprocessing.TimeoutError:
+            raise TimeoutError(f"no search finished in {budget} seconds") from None
+
+
+def start_search(crossword):
+    """
+    Keep the `crossword` to solve in a portfolio worker process.
+    """
+    global search_crossword
+    search_crossword = crossword
+
+
+def search(k):
+    """
+    Run search `k` of a portfolio on the worker's crossword.
+    """
+    creator = CrosswordCreator(search_crossword, seed=k if k else None)
+    return creator.solve(restarts=k > 0)
+
+
+def option(args, name, convert):
+    """
+    Remove a "name value" option from the command-line arguments `args`,
+    and return a tuple (args, value) with the remaining arguments and the
+    value converted with `convert`, or None if there is no option.
+    """
+    if name not in args:
+        return args, None
+    i = args.index(name)
+    if i + 1 == len(args):
+        sys.exit(f"{name} requires a value")
+    try:
+        value = convert(args[i + 1])
+    except ValueError:
+        sys.exit(f"{name} requires a number")
+    return args[:i] + args[i + 2:], value
 
 
 def main():
 
     # Check usage
-    if len(sys.argv) not in [3, 4]:
-        sys.exit("Usage: python generate.py structure words [output]")
+    args, searches = option(sys.argv[1:], "--portfolio", int)
+    args, budget = option(args, "--budget", float)
+    if (len(args) not in [2, 3]
+            or (searches is not None and searches < 1)
+            or (budget is not None and budget <= 0)):
+        sys.exit(
+            "Usage: python generate.py structure words [output] "
+            "[--portfolio searches] [--budget seconds]"
+        )
 
     # Parse command-line arguments
-    structure = sys.argv[1]
-    words = sys.argv[2]
-    output = sys.argv[3] if len(sys.argv) == 4 else None
+    structure = args[0]
+    words = args[1]
+    output = args[2] if len(args) == 3 else None
 
-    # Generate crossword
+    # Generate crossword, with a portfolio of searches if asked for one
     crossword = Crossword(structure, words)
-    creator = CrosswordCreator(crossword)
-    assignment = creator.solve()
+    if searches is None and budget is None:
+        creator = CrosswordCreator(crossword)
+        assignment = creator.solve()
+    else:
+        try:
+            assignment = portfolio(crossword, searches, budget)
+        except TimeoutError:
+            sys.exit(f"No solution found in {budget:g} seconds.")
+        creator = CrosswordCreator(crossword)
 
     # Print result
     if assignment is None:
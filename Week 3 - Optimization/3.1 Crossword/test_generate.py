@@ -1,10 +1,19 @@
+import os
+import sys
+import tempfile
+import time
 import unittest
 from unittest.mock import Mock
 from unittest.mock import patch
 
-from crossword import Crossword, Variable
+from crossword import Crossword, Variable, Vocabulary
 import generate
 
+
+def endless_search(k):
+    """Portfolio search that never finishes in time."""
+    time.sleep(60)
+
 class CrosswordCreatorTestCase(unittest.TestCase):
     
     def test_enforce_node_consistency(self):
@@ -29,7 +38,7 @@ class CrosswordCreatorTestCase(unittest.TestCase):
             mock_variable3: {"AAAAA", "BBBBB"},
             mock_variable4: set()
         }
-        self.assertDictEqual(cc.domains, expected)
+        self.assertDictEqual(dict(cc.domains), expected)
     
 
     def test_words_to_remove_unfiltered(self):
@@ -130,7 +139,7 @@ class CrosswordCreatorTestCase(unittest.TestCase):
         # function returns True
         self.assertTrue(result)
         # function updates domain: "ABA" removed
-        self.assertDictEqual(cc.domains, expected)
+        self.assertDictEqual(dict(cc.domains), expected)
     
 
     def test_revise_if_overlap_and_not_revised(self):
@@ -158,7 +167,7 @@ class CrosswordCreatorTestCase(unittest.TestCase):
         # function returns False
         self.assertFalse(result)
         # function does not update domain
-        self.assertDictEqual(cc.domains, expected)
+        self.assertDictEqual(dict(cc.domains), expected)
 
 
     def test_ac3(self):
@@ -185,7 +194,7 @@ class CrosswordCreatorTestCase(unittest.TestCase):
         result = cc.ac3()
 
         self.assertTrue(result)
-        self.assertDictEqual(cc.domains, expected)
+        self.assertDictEqual(dict(cc.domains), expected)
 
 
     def test_assignment_complete_returns_true_if_complete(self):
@@ -344,6 +353,48 @@ class CrosswordCreatorTestCase(unittest.TestCase):
                 self.assertTrue(result)
 
 
+    def test_consistent_checks_new_variable(self):
+        self.maxDiff = None
+        mock_variable1 = Mock(spec=Variable, name="var1")
+        mock_variable1.length = 3
+        mock_variable2 = Mock(spec=Variable, name="var2")
+        mock_variable2.length = 3
+        mock_variable3 = Mock(spec=Variable, name="var3")
+        mock_variable3.length = 3
+        mock_crossword = Mock(spec=Crossword)
+        mock_crossword.variables = {mock_variable1, mock_variable2, mock_variable3}
+        mock_crossword.words = {}
+        mock_crossword.overlaps = {}
+        mock_crossword.overlaps[mock_variable1, mock_variable2] = (1, 1)
+        mock_crossword.overlaps[mock_variable2, mock_variable1] = (1, 1)
+
+        def side_effect(value):
+            if value == mock_variable1:
+                return {mock_variable2}
+            elif value == mock_variable2:
+                return {mock_variable1}
+            return set()
+
+        mock_crossword.neighbors.side_effect = side_effect
+        cc = generate.CrosswordCreator(mock_crossword)
+
+        cases = [ # (assignment, used, expected)
+            ({mock_variable1: 'ABC', mock_variable2: 'CBA'}, {'CBA'}, True),
+            ({mock_variable1: 'ABC', mock_variable2: 'CDA'}, {'CDA'}, False),
+            ({mock_variable1: 'ABCD', mock_variable2: 'CBA'}, {'CBA'}, False),
+            ({mock_variable1: 'ABC', mock_variable3: 'ABC'}, {'ABC'}, False),
+            ({mock_variable1: 'ABC', mock_variable3: 'XYZ'}, {'XYZ'}, True),
+        ]
+        for assignment, used, expected in cases:
+            with self.subTest(assignment=assignment, used=used):
+                self.assertEqual(cc.consistent(assignment, mock_variable1, used), expected)
+                self.assertEqual(cc.consistent(assignment, mock_variable1), expected)
+
+        # only the new variable is checked
+        assignment = {mock_variable1: 'ABC', mock_variable2: 'ABC', mock_variable3: 'XYZ'}
+        self.assertTrue(cc.consistent(assignment, mock_variable3))
+
+
     def test_order_domain_values(self):
         self.maxDiff = None
         mock_variable1 = Mock(spec=Variable)
@@ -373,6 +424,32 @@ class CrosswordCreatorTestCase(unittest.TestCase):
                 self.assertListEqual(result, expected)
 
 
+    def test_order_domain_values_counts_eliminations(self):
+        crossword = Crossword('data/structure2.txt', 'data/words2.txt')
+        cc = generate.CrosswordCreator(crossword)
+        cc.enforce_node_consistency()
+        var = max(crossword.variables, key=lambda var: len(crossword.neighbors(var)))
+
+        # eliminations counted word by word, as the least-constraining
+        # value heuristic defines them
+        counts = {
+            word: sum(
+                len(cc.get_words_to_remove(neighbor, var, word))
+                for neighbor in crossword.neighbors(var)
+            )
+            for word in cc.domains[var]
+        }
+        result = cc.order_domain_values(var, {})
+        self.assertCountEqual(result, counts)
+        self.assertListEqual([counts[word] for word in result], sorted(counts.values()))
+
+        # with a huge domain, a sample is ordered and the rest follows
+        with patch.object(generate, 'ORDER_SAMPLE', 10):
+            result = cc.order_domain_values(var, {})
+        self.assertCountEqual(result, counts)
+        self.assertListEqual([counts[word] for word in result[:10]], sorted(counts[word] for word in result[:10]))
+
+
     def test_select_unassigned_variable_MRV_only(self):
         self.maxDiff = None
 
@@ -520,9 +597,14 @@ class CrosswordCreatorTestCase(unittest.TestCase):
         cc = generate.CrosswordCreator(mock_crossword)
 
         assignment = {mock_variable1: 'ABC', mock_variable2: 'BCD'}
+        masks = cc.masks.copy()
         result = cc.backtrack(assignment)
         self.assertIsNone(result)
 
+        # domains pruned during the search are restored
+        self.assertDictEqual(cc.masks, masks)
+        self.assertListEqual(cc.trail, [])
+
 
     def test_get_inferences_from_domains_returns_empty_dict_if_no_inference_in_domains(self):
         self.maxDiff = None
@@ -603,6 +685,272 @@ class CrosswordCreatorTestCase(unittest.TestCase):
         expected = {mock_variable1: "A"}
         self.assertDictEqual(result, expected)
 
+
+    def test_domains_are_bitmasks(self):
+        self.maxDiff = None
+        mock_variable1 = Mock(spec=Variable, name="var1")
+        mock_variable1.length = 3
+        mock_crossword = Mock(spec=Crossword)
+        mock_crossword.variables = {mock_variable1}
+        mock_crossword.words = {"BAB", "AAA", "ABA", "CC"}
+        cc = generate.CrosswordCreator(mock_crossword)
+
+        # words are numbered by length, then alphabetically
+        self.assertListEqual(cc.words, ["CC", "AAA", "ABA", "BAB"])
+        self.assertEqual(cc.masks[mock_variable1], 0b1111)
+        self.assertEqual(cc.lengths[3], 0b1110)
+        self.assertEqual(cc.letters[3, 1], {"A": 0b1010, "B": 0b0100})
+
+        # unknown words are numbered when they are first seen
+        cc.domains = {mock_variable1: {"ABA", "CDC"}}
+        self.assertEqual(cc.masks[mock_variable1], 0b10100)
+        self.assertDictEqual(dict(cc.domains), {mock_variable1: {"ABA", "CDC"}})
+        self.assertEqual(cc.letters[3, 1]["D"], 0b10000)
+
+
+    def test_domains_are_read_only(self):
+        mock_variable1 = Mock(spec=Variable, name="var1")
+        mock_variable1.length = 3
+        mock_crossword = Mock(spec=Crossword)
+        mock_crossword.variables = {mock_variable1}
+        mock_crossword.words = {"AAA", "ABA"}
+        cc = generate.CrosswordCreator(mock_crossword)
+
+        with self.assertRaises(TypeError):
+            cc.domains[mock_variable1] = {"AAA"}
+        with self.assertRaises(AttributeError):
+            cc.domains[mock_variable1].remove("AAA")
+        self.assertEqual(cc.domains[mock_variable1], {"AAA", "ABA"})
+
+
+    def test_inference_returns_none_if_domain_wiped_out(self):
+        self.maxDiff = None
+        mock_variable1 = Mock(spec=Variable, name="var1")
+        mock_variable1.length = 3
+        mock_variable2 = Mock(spec=Variable, name="var2")
+        mock_variable2.length = 3
+        mock_crossword = Mock(spec=Crossword)
+        mock_crossword.variables = {mock_variable1, mock_variable2}
+        mock_crossword.words = {"ABA", "BAB", "AAA", "CCC"}
+        mock_crossword.overlaps = {}
+        mock_crossword.overlaps[mock_variable1, mock_variable2] = (1, 1)
+        mock_crossword.overlaps[mock_variable2, mock_variable1] = (1, 1)
+
+        def side_effect(value):
+            if value == mock_variable1:
+                return {mock_variable2}
+            elif value == mock_variable2:
+                return {mock_variable1}
+
+        mock_crossword.neighbors.side_effect = side_effect
+
+        cc = generate.CrosswordCreator(mock_crossword)
+        cc.domains = {
+            mock_variable1: {"ABA", "BAB"},
+            mock_variable2: {"AAA", "CCC"},
+        }
+        self.assertIsNone(cc.inference(mock_variable1, {mock_variable1: "ABA"}))
+
+        # forward checking reduces the domain of the neighbour
+        cc.domains = {
+            mock_variable1: {"ABA", "BAB"},
+            mock_variable2: {"AAA", "CCC", "BBB"},
+        }
+        self.assertDictEqual(cc.inference(mock_variable1, {mock_variable1: "ABA"}), {mock_variable2: "BBB"})
+
+
+    def test_undo(self):
+        self.maxDiff = None
+        mock_variable1 = Mock(spec=Variable, name="var1")
+        mock_variable1.length = 3
+        mock_variable2 = Mock(spec=Variable, name="var2")
+        mock_variable2.length = 3
+        mock_crossword = Mock(spec=Crossword)
+        mock_crossword.variables = {mock_variable1, mock_variable2}
+        mock_crossword.words = {"ABA", "BAB", "AAA"}
+        cc = generate.CrosswordCreator(mock_crossword)
+        cc.domains = {
+            mock_variable1: {"ABA", "BAB", "AAA"},
+            mock_variable2: {"ABA", "BAB"},
+        }
+
+        cc.restrict(mock_variable1, cc.encode({"ABA", "BAB"}))
+        mark = len(cc.trail)
+        cc.restrict(mock_variable1, cc.encode({"ABA"}))
+        cc.restrict(mock_variable2, cc.encode({"BAB"}))
+        self.assertDictEqual(dict(cc.domains), {mock_variable1: {"ABA"}, mock_variable2: {"BAB"}})
+
+        cc.undo(mark)
+        self.assertDictEqual(dict(cc.domains), {mock_variable1: {"ABA", "BAB"}, mock_variable2: {"ABA", "BAB"}})
+        cc.undo(0)
+        self.assertDictEqual(dict(cc.domains), {mock_variable1: {"ABA", "BAB", "AAA"}, mock_variable2: {"ABA", "BAB"}})
+        self.assertListEqual(cc.trail, [])
+
+
+    def test_solve(self):
+        crossword = Crossword('data/structure2.txt', 'data/words2.txt')
+        cc = generate.CrosswordCreator(crossword)
+        assignment = cc.solve()
+        self.assertSolves(crossword, assignment)
+
+    def test_solve_with_restarts(self):
+        crossword = Crossword('data/structure0.txt', 'data/words1.txt')
+        with patch.object(generate, 'RESTART_BASE', 1), \
+                patch.object(generate, 'luby', wraps=generate.luby) as luby:
+            cc = generate.CrosswordCreator(crossword, seed=2)
+            assignment = cc.solve(restarts=True)
+            self.assertSolves(crossword, assignment)
+            self.assertGreater(luby.call_count, 1)
+            self.assertIsNone(cc.limit)
+
+            # the same seed gives the same search
+            cc = generate.CrosswordCreator(crossword, seed=2)
+            self.assertDictEqual(cc.solve(restarts=True), assignment)
+
+    def test_solve_with_restarts_returns_none_if_unsolvable(self):
+        crossword = Crossword('data/structure1.txt', 'data/words0.txt')
+        cc = generate.CrosswordCreator(crossword, seed=1)
+        self.assertIsNone(cc.solve(restarts=True))
+
+    def test_luby(self):
+        self.assertListEqual(
+            [generate.luby(k) for k in range(1, 16)],
+            [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
+        )
+
+    def test_portfolio(self):
+        crossword = Crossword('data/structure2.txt', 'data/words2.txt')
+        assignment = generate.portfolio(crossword, searches=2, budget=60)
+        self.assertSolves(crossword, assignment)
+
+    def test_portfolio_raises_timeout_error_after_budget(self):
+        crossword = Crossword('data/structure2.txt', 'data/words2.txt')
+        # Worker processes are forked, and inherit the patched search
+        with patch.object(generate, 'search', endless_search):
+            start = time.perf_counter()
+            with self.assertRaises(TimeoutError):
+                generate.portfolio(crossword, searches=2, budget=0.2)
+        self.assertLess(time.perf_counter() - start, 10)
+
+    def test_portfolio_needs_a_search(self):
+        crossword = Crossword('data/structure2.txt', 'data/words2.txt')
+        with self.assertRaises(ValueError):
+            generate.portfolio(crossword, searches=0)
+
+    def test_main_rejects_invalid_options(self):
+        for options in [['--portfolio', '0'], ['--portfolio', '-2'], ['--budget', '0']]:
+            argv = ['generate.py', 'data/structure2.txt', 'data/words2.txt'] + options
+            with self.subTest(options=options), patch.object(sys, 'argv', argv):
+                with self.assertRaises(SystemExit) as cm:
+                    generate.main()
+                self.assertTrue(str(cm.exception.code).startswith('Usage:'))
+
+    def assertSolves(self, crossword, assignment):
+        self.assertSetEqual(set(assignment), crossword.variables)
+        self.assertEqual(len(set(assignment.values())), len(assignment))
+        for var, word in assignment.items():
+            self.assertEqual(len(word), var.length)
+            self.assertIn(word, crossword.words)
+        for (v1, v2), overlap in crossword.overlaps.items():
+            if overlap:
+                i, j = overlap
+                self.assertEqual(assignment[v1][i], assignment[v2][j])
+
+# End class
+
+
+class CrosswordTestCase(unittest.TestCase):
+
+    def test_overlaps(self):
+        for i in range(3):
+            crossword = Crossword(f'data/structure{i}.txt', f'data/words{i}.txt')
+            for v1 in crossword.variables:
+                for v2 in crossword.variables:
+                    if v1 == v2:
+                        continue
+                    # overlaps computed pair by pair
+                    intersection = set(v1.cells).intersection(v2.cells)
+                    expected = None
+                    if intersection:
+                        cell = intersection.pop()
+                        expected = (v1.cells.index(cell), v2.cells.index(cell))
+                    with self.subTest(structure=i, v1=v1, v2=v2):
+                        self.assertEqual(crossword.overlaps[v1, v2], expected)
+                        self.assertEqual(v2 in crossword.neighbors(v1), expected is not None)
+
+    def test_neighbors_are_precomputed(self):
+        crossword = Crossword('data/structure1.txt', 'data/words1.txt')
+        for var in crossword.variables:
+            with self.subTest(var=var):
+                self.assertIsInstance(crossword.neighbors(var), frozenset)
+                self.assertIs(crossword.neighbors(var), crossword.neighbors(var))
+                self.assertNotIn(var, crossword.neighbors(var))
+
+# End class
+
+
+class VocabularyTestCase(unittest.TestCase):
+
+    def test_numbers(self):
+        vocabulary = Vocabulary({"BAB", "AAA", "", "ABA", "CC", "ABCD"})
+        self.assertListEqual(vocabulary.words, ["CC", "AAA", "ABA", "BAB", "ABCD"])
+        self.assertEqual(len(vocabulary), 5)
+        self.assertEqual(vocabulary.numbers(3), range(1, 4))
+        self.assertEqual(vocabulary.numbers(7), range(0, 0))
+        self.assertListEqual(vocabulary.codes[2].tolist(), [[ord("C"), ord("C")]])
+
+    def test_posting(self):
+        vocabulary = Vocabulary({"BAB", "AAA", "ABA", "CC", "ABCD"})
+        self.assertListEqual(vocabulary.posting(3, 1, "A").tolist(), [1, 3])
+        self.assertListEqual(vocabulary.posting(3, 0, "A").tolist(), [1, 2])
+        self.assertListEqual(vocabulary.posting(3, 0, "Z").tolist(), [])
+        self.assertListEqual(vocabulary.posting(3, 5, "A").tolist(), [])
+
+    def test_search(self):
+        vocabulary = Vocabulary({"APPLE", "ANGLE", "ADDLE", "AISLE", "APPLY", "EAGLE", "TABLE", "AB"})
+        self.assertListEqual(vocabulary.search("A??LE"), ["ADDLE", "AISLE", "ANGLE", "APPLE"])
+        self.assertListEqual(vocabulary.search("??"), ["AB"])
+        self.assertListEqual(vocabulary.search("Z????"), [])
+        self.assertListEqual(vocabulary.search("???"), [])
+
+    def test_save_and_load(self):
+        vocabulary = Vocabulary(Crossword('data/structure1.txt', 'data/words1.txt').words)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'words.npz')
+            vocabulary.save(filename)
+            loaded = Vocabulary.load(filename)
+
+            # Crossword uses the cache when it is up to date
+            crossword = Crossword('data/structure1.txt', 'data/words1.txt', cache=filename)
+            self.assertListEqual(crossword.vocabulary.words, vocabulary.words)
+
+        self.assertListEqual(loaded.words, vocabulary.words)
+        self.assertDictEqual(loaded.starts, vocabulary.starts)
+        self.assertSetEqual(set(loaded.postings), set(vocabulary.postings))
+        for key, arrays in vocabulary.postings.items():
+            for array, loaded_array in zip(arrays, loaded.postings[key]):
+                with self.subTest(key=key):
+                    self.assertListEqual(loaded_array.tolist(), array.tolist())
+
+    def test_cache_is_keyed_on_contents(self):
+        with tempfile.TemporaryDirectory() as directory:
+            words = os.path.join(directory, 'words.txt')
+            cache = os.path.join(directory, 'words.npz')
+            with open(words, 'w') as f:
+                f.write('ONE\nTWO\nSIX\n')
+            crossword = Crossword('data/structure0.txt', words, cache=cache)
+            self.assertListEqual(crossword.vocabulary.words, ['ONE', 'SIX', 'TWO'])
+            self.assertIsNotNone(Vocabulary.load(cache).source)
+
+            # Same number of words and same modification time
+            stat = os.stat(words)
+            with open(words, 'w') as f:
+                f.write('ONE\nTWO\nTEN\n')
+            os.utime(words, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            crossword = Crossword('data/structure0.txt', words, cache=cache)
+            self.assertListEqual(crossword.vocabulary.words, ['ONE', 'TEN', 'TWO'])
+            self.assertListEqual(Vocabulary.load(cache).words, ['ONE', 'TEN', 'TWO'])
+
 # End class
 
 
@@ -627,8 +975,10 @@ def suite():
     suite.addTest(CrosswordCreatorTestCase('test_assignment_complete_returns_false_if_incorrect_length'))
     suite.addTest(CrosswordCreatorTestCase('test_assignment_complete_returns_false_if_conflicts_neighbor'))
     suite.addTest(CrosswordCreatorTestCase('test_assignment_complete'))
+    suite.addTest(CrosswordCreatorTestCase('test_consistent_checks_new_variable'))
     
     suite.addTest(CrosswordCreatorTestCase('test_order_domain_values'))
+    suite.addTest(CrosswordCreatorTestCase('test_order_domain_values_counts_eliminations'))
 
     suite.addTest(CrosswordCreatorTestCase('test_select_unassigned_variable_MRV_only'))
     suite.addTest(CrosswordCreatorTestCase('test_select_unassigned_variable_MRV_plus_degrees'))
@@ -639,6 +989,28 @@ def suite():
     suite.addTest(CrosswordCreatorTestCase('test_get_inferences_from_domains_returns_empty_dict_if_no_inference_in_domains'))
     suite.addTest(CrosswordCreatorTestCase('test_get_inferences_from_domains_returns_empty_dict_if_already_in_assignment'))
     suite.addTest(CrosswordCreatorTestCase('test_get_inferences_from_domains'))
+
+    suite.addTest(CrosswordCreatorTestCase('test_domains_are_bitmasks'))
+    suite.addTest(CrosswordCreatorTestCase('test_domains_are_read_only'))
+    suite.addTest(CrosswordCreatorTestCase('test_inference_returns_none_if_domain_wiped_out'))
+    suite.addTest(CrosswordCreatorTestCase('test_undo'))
+    suite.addTest(CrosswordCreatorTestCase('test_solve'))
+    suite.addTest(CrosswordCreatorTestCase('test_solve_with_restarts'))
+    suite.addTest(CrosswordCreatorTestCase('test_solve_with_restarts_returns_none_if_unsolvable'))
+    suite.addTest(CrosswordCreatorTestCase('test_luby'))
+    suite.addTest(CrosswordCreatorTestCase('test_portfolio'))
+    suite.addTest(CrosswordCreatorTestCase('test_portfolio_raises_timeout_error_after_budget'))
+    suite.addTest(CrosswordCreatorTestCase('test_portfolio_needs_a_search'))
+    suite.addTest(CrosswordCreatorTestCase('test_main_rejects_invalid_options'))
+
+    suite.addTest(CrosswordTestCase('test_overlaps'))
+    suite.addTest(CrosswordTestCase('test_neighbors_are_precomputed'))
+
+    suite.addTest(VocabularyTestCase('test_numbers'))
+    suite.addTest(VocabularyTestCase('test_posting'))
+    suite.addTest(VocabularyTestCase('test_search'))
+    suite.addTest(VocabularyTestCase('test_save_and_load'))
+    suite.addTest(VocabularyTestCase('test_cache_is_keyed_on_contents'))
         
     return suite
 